@@ -0,0 +1,49 @@
+"""
+Measures how `export_services` scales with the number of worker threads.
+
+Runs the export against the fake SCM backend with a fixed latency injected into
+every call, which approximates the RPC round-trips of a loaded Windows host.
+
+Usage:
+    python bench_export_jobs.py [--services 200] [--latency 0.002] [--jobs 1 2 4 8 16]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import caps  # noqa: E402
+import scm_backend  # noqa: E402
+
+
+def run(service_count, latency, jobs):
+    scm_backend.set_backend(scm_backend.FakeBackend(service_count=service_count, latency=latency))
+    started = time.perf_counter()
+    # Keep the structured log lines off the console
+    with contextlib.redirect_stderr(io.StringIO()):
+        caps.export_services(jobs=jobs)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    print(f"services={args.services} latency={args.latency * 1000:.1f}ms per call")
+    print(f"{'jobs':>6} {'seconds':>10} {'speedup':>9}")
+    baseline = None
+    for jobs in args.jobs:
+        elapsed = run(args.services, args.latency, jobs)
+        baseline = baseline or elapsed
+        print(f"{jobs:>6} {elapsed:>10.3f} {baseline / elapsed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Measures the memory held by exported services as dicts and as `ServiceRecord`s.
+
+Builds `--services` services from QueryServiceConfig-shaped tuples both ways and
+reports the bytes allocated per service, as traced by `tracemalloc`. Every
+tuple carries freshly allocated strings, as pywin32 returns them.
+
+Usage:
+    python bench_records.py [--services 10000]
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from service_helpers import get_service_state_description, get_start_type_description  # noqa: E402
+from service_record import ServiceRecord  # noqa: E402
+
+_LOGONS = ["LocalSystem", "NT AUTHORITY\\LocalService", "NT AUTHORITY\\NetworkService"]
+
+
+def _configs(count):
+    # (service_type, start_type, error_control, path, load_order_group, tag_id,
+    #  dependencies, logon, display_name) and the status tuple of the enumeration
+    for index in range(count):
+        logon = "".join(_LOGONS[index % len(_LOGONS)])
+        config = (
+            0x10, 2 + index % 3, 1, f"C:\\Fake\\service{index:05d}.exe", "", 0,
+            [f"FakeService{index - 1:05d}"] if index % 4 == 0 and index else [],
+            logon, f"Fake Service {index}",
+        )
+        status = (0x10, 4 if index % 3 == 0 else 1, 0, 0, 0, 0, 0)
+        yield f"FakeService{index:05d}", config, f"Simulated service number {index}.", status
+
+
+def as_dict(name, config, description, status):
+    return {
+        "name": name,
+        "path": config[3],
+        "startupType": get_start_type_description(config[1]),
+        "logon": config[7],
+        "state": get_service_state_description(status[1]),
+        "displayName": config[8],
+        "description": description,
+        "dependencies": config[6],
+    }
+
+
+def measure(build, count):
+    """
+    Returns the bytes still allocated after building `count` services with `build`.
+    """
+    inputs = list(_configs(count))
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        services = [build(*entry) for entry in inputs]
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del services
+    return allocated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--services", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    dicts = measure(as_dict, args.services)
+    records = measure(ServiceRecord.from_config, args.services)
+    results = {
+        "services": args.services,
+        "dictBytes": dicts,
+        "recordBytes": records,
+        "dictBytesPerService": dicts / args.services,
+        "recordBytesPerService": records / args.services,
+        "ratio": records / dicts,
+    }
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Benchmarks the service resource against the fake SCM backend.
+
+Every case runs `--repeat` times against a fresh fake backend with `--latency`
+seconds injected into each SCM call. The results are written as JSON so runs of
+different commits can be compared; `--compare` flags cases that got slower than
+the baseline by more than `--threshold` and exits with 1 if there are any.
+
+Usage:
+    python bench_suite.py [--latency 0] [--repeat 5] [--quick] [--only export]
+                          [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+# CLI cases run against the fake backend through this entry point
+FAKE_MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_main.py")
+
+import caps  # noqa: E402
+import handles  # noqa: E402
+import schema  # noqa: E402
+import scm_backend  # noqa: E402
+import service_helpers  # noqa: E402
+
+RESULTS_VERSION = 1
+
+
+def _quiet(function, *args, **kwargs):
+    # Swallow command output and exit codes, they are not what is measured
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        try:
+            return function(*args, **kwargs)
+        except SystemExit:
+            return None
+
+
+def _fake(service_count, latency):
+    handles.close_handles()
+    backend = scm_backend.FakeBackend(service_count=service_count, latency=latency)
+    scm_backend.set_backend(backend)
+    return backend
+
+
+def _desired(count):
+    return [
+        {"name": f"FakeService{index:05d}", "path": f"C:\\Bench\\service{index:05d}.exe"}
+        for index in range(count)
+    ]
+
+
+def bench_export(count):
+    def setup(latency):
+        _fake(count, latency)
+        return lambda: _quiet(caps.export_services)
+    return setup
+
+
+def bench_get(count):
+    names = json.dumps([f"FakeService{index:05d}" for index in range(count)])
+    single = json.dumps({"name": "FakeService00000"})
+
+    def setup(latency):
+        _fake(max(count, 1), latency)
+        return lambda: _quiet(caps.get_service, names if count > 1 else single)
+    return setup
+
+
+def bench_set(count, what_if=False):
+    inputs = json.dumps(_desired(count) if count > 1 else _desired(1)[0])
+
+    def setup(latency):
+        # A fresh backend per run so every run writes the same changes
+        _fake(max(count, 1), latency)
+        return lambda: _quiet(caps.set_service, inputs, what_if=what_if)
+    return setup
+
+
+def bench_log_message(count, level):
+    def setup(latency):
+        service_helpers.set_log_level("INFO")
+
+        def run():
+            with contextlib.redirect_stderr(io.StringIO()):
+                for index in range(count):
+                    service_helpers.log_message(level, "serviceGetRetrieving", "bench", index)
+        return run
+    return setup
+
+
+def bench_validate_json_input(count):
+    inputs = json.dumps(_desired(count) if count > 1 else _desired(1)[0])
+
+    def setup(latency):
+        return lambda: service_helpers.validate_json_input(
+            inputs, "path", allow_array=True, schema=schema.SERVICE_SCHEMA
+        )
+    return setup
+
+
+def bench_cli(*arguments):
+    def setup(latency):
+        env = dict(os.environ, WIN32SERVICE_FAKE_SERVICES="100", WIN32SERVICE_FAKE_LATENCY=str(latency))
+        command = [sys.executable, FAKE_MAIN, *arguments]
+        return lambda: subprocess.run(command, env=env, cwd=SRC_DIR, capture_output=True, check=False)
+    return setup
+
+
+CASES = {
+    "export_100": bench_export(100),
+    "export_1k": bench_export(1000),
+    "export_10k": bench_export(10000),
+    "get_single": bench_get(1),
+    "get_batch_100": bench_get(100),
+    "set_single": bench_set(1),
+    "set_batch_100": bench_set(100),
+    "what_if_single": bench_set(1, what_if=True),
+    "what_if_batch_100": bench_set(100, what_if=True),
+    "log_message_emitted_10k": bench_log_message(10000, "INFO"),
+    "log_message_filtered_10k": bench_log_message(10000, "DEBUG"),
+    "validate_json_input_object": bench_validate_json_input(1),
+    "validate_json_input_array_1k": bench_validate_json_input(1000),
+    "cli_schema": bench_cli("schema"),
+    "cli_get": bench_cli("config", "get", "--input", '{"name": "FakeService00000"}'),
+    "cli_set_what_if": bench_cli(
+        "config", "set", "--what-if", "--input", '{"name": "FakeService00000", "path": "C:\\\\x.exe"}'
+    ),
+    "cli_delete_what_if": bench_cli("config", "delete", "--what-if", "--input", '{"name": "FakeService00000"}'),
+    "cli_export": bench_cli("config", "export"),
+}
+
+# Cases left out by --quick
+SLOW_CASES = {"export_10k"}
+
+
+def run_case(setup, latency, repeat):
+    """
+    Times a case `repeat` times, each run against a freshly set up backend.
+
+    Returns:
+        dict: Minimum, median and maximum seconds of a run.
+    """
+    timings = []
+    for _ in range(repeat):
+        run = setup(latency)
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+        "runs": repeat,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns the cases whose median got slower than the baseline by more than `threshold`.
+    """
+    regressions = []
+    for name, result in results["cases"].items():
+        before = baseline.get("cases", {}).get(name)
+        if before and result["median"] > before["median"] * (1 + threshold):
+            regressions.append(
+                {"case": name, "baseline": before["median"], "median": result["median"],
+                 "ratio": result["median"] / before["median"]}
+            )
+    return regressions
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds injected into every SCM call")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="skip the slowest cases")
+    parser.add_argument("--only", nargs="+", default=[], help="run cases whose name contains one of these")
+    parser.add_argument("--output", help="write the results to this file instead of stdout")
+    parser.add_argument("--compare", help="baseline results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="tolerated slowdown, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    selected = [
+        name for name in CASES
+        if (not args.quick or name not in SLOW_CASES)
+        and (not args.only or any(part in name for part in args.only))
+    ]
+
+    previous = scm_backend.set_backend(None)
+    level_names = {value: name for name, value in service_helpers.LOG_LEVELS.items()}
+    previous_level = level_names[service_helpers.get_log_level()]
+    results = {
+        "version": RESULTS_VERSION,
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency": args.latency,
+        "cases": {},
+    }
+    try:
+        for name in selected:
+            results["cases"][name] = run_case(CASES[name], args.latency, args.repeat)
+            service_helpers.set_log_level(previous_level)
+            print(f"{name:<32} {results['cases'][name]['median'] * 1000:>10.2f} ms", file=sys.stderr)
+    finally:
+        handles.close_handles()
+        scm_backend.set_backend(previous)
+
+    code = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            results["regressions"] = compare(results, json.load(fp), args.threshold)
+        code = 1 if results["regressions"] else 0
+
+    document = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            fp.write(document + "\n")
+    else:
+        print(document)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Runs the win32service CLI against the fake SCM backend.
+
+For benchmarks and tests only: the shipped CLI always talks to the real
+Service Control Manager. The fake is sized with WIN32SERVICE_FAKE_SERVICES
+and slowed down with WIN32SERVICE_FAKE_LATENCY seconds per call.
+
+Usage:
+    python fake_main.py config export --properties name,state
+"""
+import os
+import runpy
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+MAIN_PATH = os.path.join(SRC_DIR, "main.py")
+
+
+def main():
+    sys.path.insert(0, SRC_DIR)
+    # The schema command never talks to the SCM; keep its imports untouched
+    if sys.argv[1:2] != ["schema"]:
+        import scm_backend
+
+        scm_backend.set_backend(
+            scm_backend.FakeBackend(
+                service_count=int(os.environ.get("WIN32SERVICE_FAKE_SERVICES", "0")),
+                latency=float(os.environ.get("WIN32SERVICE_FAKE_LATENCY", "0")),
+            )
+        )
+    sys.argv[0] = MAIN_PATH
+    runpy.run_path(MAIN_PATH, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -102,6 +102,19 @@ if ($Build.IsPresent) {
 if ($Test.IsPresent) {
     $pathToTest = Join-Path $root 'resources' 'win32service' 'tests'
 
+    # Run the Python unit tests, including the start-up import budgets
+    Install-UvPackageManager
+    Push-Location -Path (Join-Path $root 'resources' 'win32service' 'src') -ErrorAction Stop
+    try {
+        & uv run pytest -q
+        if ($LASTEXITCODE -ne 0) {
+            throw "Python unit tests failed with exit code $LASTEXITCODE"
+        }
+    }
+    finally {
+        Pop-Location -ErrorAction Ignore
+    }
+
     $env:Path += [System.IO.Path]::PathSeparator + (Join-Path $root 'resources' 'win32service' 'output')
     Invoke-Pester -Path $pathToTest -Output Detailed -ErrorAction Stop
 }
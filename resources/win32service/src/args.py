@@ -2,6 +2,36 @@ import argparse
 
 from localization import _
 
+# Worker threads used by `--jobs` when no count is given
+DEFAULT_JOBS = 8
+
+
+class TranslatingHelpFormatter(argparse.HelpFormatter):
+    """
+    Help formatter translating description and help message IDs when help is shown.
+    """
+
+    def add_text(self, text):
+        if text and text is not argparse.SUPPRESS:
+            text = _(text)
+        super().add_text(text)
+
+    def _get_help_string(self, action):
+        return _(action.help)
+
+
+class TranslatingArgumentParser(argparse.ArgumentParser):
+    """
+    Argument parser taking message IDs for its help texts.
+
+    The IDs are only translated when help is printed, so parsing arguments does
+    not load the message catalog.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("formatter_class", TranslatingHelpFormatter)
+        super().__init__(*args, **kwargs)
+
 
 def create_parser():
     """
@@ -10,34 +40,71 @@ def create_parser():
     Returns:
         argparse.ArgumentParser: The argument parser for the script.
     """
-    parser = argparse.ArgumentParser(description=_("about"))
+    parser = TranslatingArgumentParser(description="about")
+    parser.add_argument("--profile", metavar="FILE", help="profile")
     subparsers = parser.add_subparsers(dest="config", required=True)
 
     # Create config subparser
-    config_parser = subparsers.add_parser("config", help=_("configAbout"))
+    config_parser = subparsers.add_parser("config", help="configAbout")
     config_subparsers = config_parser.add_subparsers(dest="action", required=True)
 
     # Define common arguments
     def add_common_args(parser, include_what_if=False):
-        parser.add_argument("--input", "-i", type=str, required=True, help=_("input"))
+        parser.add_argument("--input", "-i", type=str, required=True, help="input")
         if include_what_if:
-            parser.add_argument("--what-if", "-w", action="store_true", help=_("whatIf"))
+            parser.add_argument("--what-if", "-w", action="store_true", help="whatIf")
 
     # Define all config actions with their required arguments
     config_actions = {
-        "get": {"help": _("configAboutGet"), "what_if": False},
-        "set": {"help": _("configAboutSet"), "what_if": True},
-        "delete": {"help": _("configAboutDelete"), "what_if": True},
-        "export": {"help": _("configAboutExport"), "what_if": False, "no_input": True},
+        "get": {"help": "configAboutGet", "what_if": False},
+        "set": {"help": "configAboutSet", "what_if": True},
+        "delete": {"help": "configAboutDelete", "what_if": True},
+        "export": {"help": "configAboutExport", "what_if": False, "no_input": True},
     }
 
     # Create parsers for each config action
+    action_parsers = {}
     for action, options in config_actions.items():
         action_parser = config_subparsers.add_parser(action, help=options["help"])
         if not options.get("no_input", False):
             add_common_args(action_parser, options["what_if"])
+        action_parsers[action] = action_parser
+
+    action_parsers["get"].add_argument("--from-snapshot", type=str, help="fromSnapshot")
+
+    for action in ("set", "delete", "export"):
+        action_parsers[action].add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            nargs="?",
+            default=1,
+            const=DEFAULT_JOBS,
+            help="jobs",
+        )
+    action_parsers["export"].add_argument(
+        "--stream", action="store_true", help="stream"
+    )
+    action_parsers["export"].add_argument("--filter", "-f", type=str, help="filter")
+    action_parsers["export"].add_argument("--properties", "-p", type=str, help="properties")
+    action_parsers["export"].add_argument("--machines", "-m", type=str, help="machines")
+    action_parsers["export"].add_argument(
+        "--cache", action="store_true", help="cache"
+    )
+    action_parsers["export"].add_argument(
+        "--refresh", action="store_true", help="refresh"
+    )
+    action_parsers["export"].add_argument("--cache-file", type=str, help="cacheFile")
+    action_parsers["export"].add_argument("--since", type=str, help="since")
+    action_parsers["export"].add_argument(
+        "--update-snapshot", action="store_true", help="updateSnapshot"
+    )
+    action_parsers["export"].add_argument("--save-snapshot", type=str, help="saveSnapshot")
 
     # Add schema command
-    subparsers.add_parser("schema", help=_("schemaAbout"))
+    subparsers.add_parser("schema", help="schemaAbout")
+
+    # Add serve command
+    subparsers.add_parser("serve", help="serveAbout")
 
     return parser
\ No newline at end of file
@@ -1,366 +1,937 @@
 import json
-import win32service
+import sys
+import time
 from sys import exit
 
+import handles
+import scm_backend
+from handles import get_handle_manager
+
 from service_helpers import (
     validate_json_input,
     get_start_type_description,
-    get_service_status,
+    get_service_state_description,
     validate_credentials,
     log_message,
     record_changes,
 )
 
 from localization import _
+from profiler import get_profiler
+from schema import GET_INPUT_SCHEMA, SERVICE_SCHEMA
+from scheduler import DependencyCycleError, dependency_waves, run_waves
+from service_control import stop_service
+from service_record import ServiceRecord
+from projection import (
+    CONFIG_PROPERTIES,
+    DESCRIPTION_PROPERTIES,
+    SERVICE_PROPERTIES,
+    STATUS_PROPERTIES,
+    needs,
+    parse_properties,
+)
+
+
+# Properties of a desired state compared with the current state of a service
+PLANNED_PROPERTIES = [
+    "path",
+    "startupType",
+    "displayName",
+    "description",
+    "dependencies",
+    "logon",
+]
+
+# Properties read from an existing service before converging it
+SET_PROPERTIES = ("name",) + tuple(PLANNED_PROPERTIES)
 
+# Actions of a change plan entry
+PLAN_ACTIONS = ("create", "update", "unchanged", "failed")
 
-def get_service(inputs):
+
+def get_service(inputs, snapshot_path=None):
     """
-    Retrieves information about a Windows service and returns it as JSON.
+    Retrieves information about one or more Windows services and returns it as JSON.
 
     Args:
-        inputs (str): JSON string containing the input data. Must include a property 'name'.
+        inputs (str): JSON string containing the input data. Either an object with a
+            property 'name', or an array of service names or such objects. An
+            optional 'properties' array selects the properties to return, and
+            an optional 'machines' array of an object queries those machines.
+        snapshot_path (str): Indexed snapshot written by `config export
+            --save-snapshot` to read the services from instead of the SCM.
 
     Returns:
-        str: JSON string containing service information.
+        str: JSON string containing service information. An array of results is
+            returned when the input is an array or lists machines.
     """
     # Parse and validate the input JSON
-    json_str = validate_json_input(inputs, str, "name")
-    service_name = json_str["name"]
+    json_str = validate_json_input(inputs, allow_array=True, schema=GET_INPUT_SCHEMA)
+    batch = isinstance(json_str, list)
+    items = json_str if batch else [json_str]
+    if snapshot_path is not None:
+        _reject_machines(items, "config get --from-snapshot")
+        results = _get_services_from_snapshot(snapshot_path, items)
+        return json.dumps(results if batch else results[0])
+    if not batch and json_str.get("machines"):
+        return json.dumps(_get_service_on_machines(json_str, json_str["machines"]))
+    _reject_machines(items, "batch config get")
+    manager = get_handle_manager()
 
+    service_name = None
     try:
-        log_message("DEBUG", _("serviceGetRetrieving", service_name), "service")
-        scm = win32service.OpenSCManager(None, None, win32service.SC_MANAGER_ALL_ACCESS)
+        if batch:
+            log_message("DEBUG", "serviceGetBatch", "service", len(items))
+        # Fail for the whole request if the SCM itself cannot be reached
+        manager.scm(handles.SCM_ACCESS_CONNECT)
 
-        try:
-            service = win32service.OpenService(
-                scm, service_name, win32service.SERVICE_QUERY_CONFIG
-            )
-            config = win32service.QueryServiceConfig(service)
-            description = win32service.QueryServiceConfig2(
-                service, win32service.SERVICE_CONFIG_DESCRIPTION
-            )
-            win32service.CloseServiceHandle(service)
-
-            json_string = {
-                "name": service_name,
-                "path": config[3],
-                "startupType": get_start_type_description(config[1]),
-                "logon": config[7],
-                "state": get_service_status(scm, service_name),
-                "displayName": config[8],
-                "description": description,
-                "dependencies": config[6],
-            }
-        except win32service.error:
-            json_string = {"name": service_name, "_exist": False}
-
-        return json.dumps(json_string)
+        results = []
+        for item in items:
+            service_name = item["name"]
+            properties = parse_properties(item.get("properties"))
+            results.append(_query_service(manager, service_name, properties))
+
+        return json.dumps(results if batch else results[0])
     except Exception as e:
-        log_message("ERROR", _("serviceGetStatusError", service_name, str(e)), "service")
+        log_message("ERROR", "serviceGetStatusError", "service", service_name, str(e))
         exit(3)
 
 
-def set_service(inputs, what_if=False):
+def _reject_machines(items, operation):
+    """
+    Exits with code 4 if a `get` input object lists machines where only the
+    local machine is queried. Only a single-object `get` queries remote
+    machines; `set` and `delete` reject them through the schema.
+    """
+    if any(item.get("machines") for item in items):
+        log_message("ERROR", "machinesUnsupported", "service", operation)
+        exit(4)
+
+
+def _get_services_from_snapshot(snapshot_path, items):
+    """
+    Looks services up in an indexed snapshot without contacting the SCM.
+
+    Returns:
+        list: One result per item, carrying the 'snapshotTime' it was taken at.
+            Services missing from the snapshot have `_exist` set to False.
+    """
+    from snapshot import IndexedSnapshot
+
+    try:
+        snapshot = IndexedSnapshot(snapshot_path)
+    except (OSError, ValueError) as e:
+        log_message("ERROR", "snapshotReadError", "snapshot", snapshot_path, str(e))
+        exit(4)
+
+    results = []
+    with snapshot:
+        snapshot_time = snapshot.created_time
+        for item in items:
+            properties = parse_properties(item.get("properties"))
+            try:
+                service = snapshot.lookup(item["name"])
+            except ValueError as e:
+                log_message("ERROR", "snapshotReadError", "snapshot", snapshot_path, str(e))
+                exit(4)
+            if service is None:
+                result = {"name": item["name"], "_exist": False}
+            else:
+                # Properties the snapshot was exported without are left out
+                result = {key: service[key] for key in properties or SERVICE_PROPERTIES if key in service}
+            result["snapshotTime"] = snapshot_time
+            results.append(result)
+    return results
+
+
+def _get_service_on_machines(item, machines):
+    """
+    Queries a service on many machines concurrently.
+
+    Returns:
+        list: One result per machine, in the order of `machines`, tagged with
+            a 'machine' property. Machines that failed carry an 'error' instead.
+    """
+    from fanout import fan_out
+
+    properties = parse_properties(item.get("properties"))
+
+    def query(machine):
+        manager = get_handle_manager(machine)
+        manager.scm(handles.SCM_ACCESS_CONNECT)
+        return _query_service(manager, item["name"], properties)
+
+    return [
+        _machine_result(machine, result, error)
+        for machine, result, error in fan_out(machines, query)
+    ]
+
+
+def _machine_result(machine, result, error):
+    if error is not None:
+        return {"machine": machine, "error": error}
+    if isinstance(result, list):
+        return {"machine": machine, "services": result}
+    return {"machine": machine, **result}
+
+
+def _query_service(manager, service_name, properties=None):
+    """
+    Queries the configuration and state of a single service.
+
+    Only the SCM calls needed for the selected properties are made.
+
+    Args:
+        manager (HandleManager): Handle manager of the backend to query.
+        service_name (str): Name of the service.
+        properties (tuple): Properties to return. All properties when None.
+
+    Returns:
+        dict: Service information, or the name with `_exist` set to False if the
+            service cannot be opened.
+    """
+    log_message("DEBUG", "serviceGetRetrieving", "service", service_name)
+    backend = manager.backend
+    need_config = needs(properties, CONFIG_PROPERTIES | {"displayName"})
+    need_description = needs(properties, DESCRIPTION_PROPERTIES)
+    need_status = needs(properties, STATUS_PROPERTIES)
+
+    access = 0
+    if need_config or need_description:
+        access |= scm_backend.SERVICE_QUERY_CONFIG
+    if need_status or not access:
+        # Opening the service is what tells whether it exists
+        access |= scm_backend.SERVICE_QUERY_STATUS
+
+    config = description = status = None
+    try:
+        with manager.service(service_name, access) as service:
+            if need_config:
+                config = backend.query_service_config(service)
+            if need_description:
+                description = backend.query_service_config2(
+                    service, scm_backend.SERVICE_CONFIG_DESCRIPTION
+                )
+            if need_status:
+                status = backend.query_service_status(service)
+
+        return ServiceRecord.from_config(service_name, config, description, status).to_dict(properties)
+    except scm_backend.error:
+        return {"name": service_name, "_exist": False}
+
+
+def set_service(inputs, what_if=False, jobs=1):
     """
     Sets the configuration for a Windows service. If the service already exists, updates its properties.
 
+    An array of desired states is applied by `set_services` instead.
+
     Args:
         inputs (str): JSON string containing the input data. Must include properties like 'name', 'path', 'startupType', etc.
         what_if (bool): If True, performs a dry run without making changes.
+        jobs (int): Number of worker threads applying an array of desired states.
 
     Returns:
         str: JSON string indicating success or failure.
     """
 
-    json_str = validate_json_input(inputs, "name", "path")
+    json_str = validate_json_input(inputs, "path", allow_array=True, schema=SERVICE_SCHEMA)
+    if isinstance(json_str, list):
+        return set_services(json_str, what_if=what_if, jobs=jobs)
+
     service_name = json_str["name"]
 
     if what_if:
         # Perform a dry run analysis
-        return what_if_service(inputs, service_name)
+        return what_if_service(json_str)
+
+    # Validate username and password
+    validate_credentials(json_str.get("username"), json_str.get("password"))
 
+    result = _apply_service(get_handle_manager(), json_str)
+    exit(3 if result["result"] == "failed" else 0)
+
+
+def set_services(desired_states, what_if=False, jobs=1):
+    """
+    Applies a list of desired service states over a single SCM connection.
+
+    Services are applied in dependency order: a service only starts once the
+    services of the batch it depends on have been applied, and services that
+    do not depend on each other are applied concurrently over `jobs` threads.
+
+    Prints one JSON document with a result per service ('created', 'updated',
+    'unchanged' or 'failed') and exits with 0 if every service was applied, or 3 otherwise.
+
+    Args:
+        desired_states (list): Validated desired state objects.
+        what_if (bool): If True, prints the change plan of `plan_services` instead.
+        jobs (int): Number of worker threads applying independent services.
+    """
+    _reject_duplicate_names([desired["name"] for desired in desired_states])
+    if what_if:
+        print(json.dumps(plan_services(desired_states, jobs)))
+        return
+
+    by_name = {desired["name"]: desired for desired in desired_states}
+    waves = _dependency_waves(
+        {name: desired.get("dependencies") for name, desired in by_name.items()}
+    )
+
+    log_message("DEBUG", "serviceSetBatch", "service", len(desired_states))
+    manager = get_handle_manager()
     try:
-        scm = win32service.OpenSCManager(None, None, win32service.SC_MANAGER_ALL_ACCESS)
-        # Validate username and password
-        username, password = validate_credentials(
-            json_str.get("username"), json_str.get("password")
-        )
+        # One connection with create rights serves every create and update
+        manager.scm(handles.SCM_ACCESS_CREATE)
+    except scm_backend.error as e:
+        log_message("ERROR", "serviceSetBatchError", "service", str(e.args))
+        exit(3)
 
-        log_message(
-            "DEBUG",
-            _("serviceSetCreatingWithParams", json.dumps(json_str, indent=2)),
-            "service",
-        )
+    applied = run_waves(waves, lambda name: _apply_service(manager, by_name[name]), jobs)
+    results = [applied[desired["name"]] for desired in desired_states]
+
+    print(json.dumps({"services": results}))
+    exit(3 if any(result["result"] == "failed" for result in results) else 0)
 
-        service = win32service.CreateService(
-            scm,
-            json_str["name"],
-            json_str.get("displayName", json_str["name"]),
-            win32service.SERVICE_ALL_ACCESS,
-            win32service.SERVICE_WIN32_OWN_PROCESS,
-            get_start_type_description(json_str.get("startupType", "Disabled")),
-            win32service.SERVICE_ERROR_NORMAL,
-            json_str["path"],
-            None,
-            False,
-            json_str.get("dependencies", []),
-            username,
-            password,
+
+def _apply_service(manager, desired):
+    """
+    Converges a service to its desired state with as few writes as possible.
+
+    The current state is read first. A missing service is created; for an
+    existing one only the properties that differ are written, passing
+    `SERVICE_NO_CHANGE`/None for the rest, and nothing is written at all if
+    every property already matches.
+
+    Args:
+        manager (HandleManager): Handle manager of the backend to use.
+        desired (dict): Desired state of the service. Must include 'name' and 'path'.
+
+    Returns:
+        dict: The service name and its result: 'created', 'updated', 'unchanged'
+            or 'failed'. Updated results list the written properties in
+            'changes', failed results carry an 'error' message.
+    """
+    service_name = desired["name"]
+    username, password = desired.get("username"), desired.get("password")
+    if bool(username) != bool(password):
+        log_message("ERROR", "credentialMismatch", "service")
+        return {"name": service_name, "result": "failed", "error": _("credentialMismatch")}
+
+    current_service_info = _query_service(manager, service_name, SET_PROPERTIES)
+    if current_service_info.get("_exist") is False:
+        result = _create_service(manager, desired)
+        if result is not None:
+            return result
+        # Created by someone else in the meantime: write every desired property
+        changes = record_changes({}, desired, PLANNED_PROPERTIES)
+    else:
+        changes = record_changes(current_service_info, desired, PLANNED_PROPERTIES)
+
+    if not changes:
+        log_message("DEBUG", "serviceSetUnchanged", "service", service_name)
+        return {"name": service_name, "result": "unchanged"}
+
+    log_message("INFO", "serviceSetExistsUpdating", "service", service_name)
+    config_changes = [prop for prop in changes if prop != "description"]
+    try:
+        with manager.service(service_name, handles.SERVICE_ACCESS_UPDATE) as service:
+            if config_changes:
+                manager.backend.change_service_config(
+                    service,
+                    scm_backend.SERVICE_NO_CHANGE,
+                    get_start_type_description(desired["startupType"])
+                    if "startupType" in changes
+                    else scm_backend.SERVICE_NO_CHANGE,
+                    scm_backend.SERVICE_NO_CHANGE,
+                    desired["path"] if "path" in changes else None,
+                    None,
+                    0,
+                    desired["dependencies"] if "dependencies" in changes else None,
+                    username if "logon" in changes else None,
+                    password if "logon" in changes else None,
+                    desired["displayName"] if "displayName" in changes else None,
+                )
+            if "description" in changes:
+                manager.backend.change_service_config2(
+                    service, scm_backend.SERVICE_CONFIG_DESCRIPTION, desired["description"]
+                )
+    except scm_backend.error as e:
+        log_message("ERROR", "serviceSetUpdateError", "service", service_name, e.args)
+        return {"name": service_name, "result": "failed", "error": str(e)}
+
+    log_message("DEBUG", "serviceSetUpdatedSuccess", "service", service_name)
+    return {"name": service_name, "result": "updated", "changes": list(changes)}
+
+
+def _create_service(manager, desired):
+    """
+    Creates a service and sets its description.
+
+    Returns:
+        dict or None: The 'created' or 'failed' result, or None if the service
+            already exists.
+    """
+    service_name = desired["name"]
+    log_message(
+        "DEBUG",
+        "serviceSetCreatingWithParams",
+        "service",
+        service_name,
+        # Serialized only if the debug message is emitted
+        lambda: json.dumps(
+            {k: v for k, v in desired.items() if k != "password"}, indent=2
+        ),
+    )
+
+    try:
+        manager.create_service(
+            service_name,
+            desired.get("displayName", service_name),
+            scm_backend.SERVICE_WIN32_OWN_PROCESS,
+            get_start_type_description(desired.get("startupType", "Disabled")),
+            scm_backend.SERVICE_ERROR_NORMAL,
+            desired["path"],
+            desired.get("dependencies", []),
+            desired.get("username") or None,
+            desired.get("password") or None,
         )
-        win32service.CloseServiceHandle(service)
-        log_message("INFO", _("serviceSetCreatedSuccess", json_str["name"]), "service")
-        exit(0)
-    except win32service.error as e:
-        if e.winerror == 1073:  # 1073 is ERROR_SERVICE_EXIST
-            log_message(
-                "INFO", _("serviceSetExistsUpdating", json_str["name"]), "service"
-            )
-            service = win32service.OpenService(
-                scm, json_str["name"], win32service.SERVICE_CHANGE_CONFIG
-            )
-            win32service.ChangeServiceConfig(
-                service,
-                win32service.SERVICE_NO_CHANGE,
-                get_start_type_description(json_str.get("startupType", "Disabled")),
-                win32service.SERVICE_NO_CHANGE,
-                json_str["path"],
-                None,
-                0,
-                json_str.get("dependencies", []),
-                None,
-                None,
-                json_str.get("displayName", json_str["name"]),
-            )
-            win32service.CloseServiceHandle(service)
-            log_message(
-                "DEBUG",
-                _("serviceSetUpdatedSuccess", json_str["name"]),
-                "service",
-            )
-            exit(0)
-        else:
-            log_message("ERROR", _("serviceSetUpdateError", str(e.args)), "service")
-            exit(3)
+        if desired.get("description") is not None:
+            with manager.service(service_name, handles.SERVICE_ACCESS_UPDATE) as service:
+                manager.backend.change_service_config2(
+                    service, scm_backend.SERVICE_CONFIG_DESCRIPTION, desired["description"]
+                )
+    except scm_backend.error as e:
+        if e.winerror == scm_backend.ERROR_SERVICE_EXISTS:
+            return None
+        log_message("ERROR", "serviceSetUpdateError", "service", service_name, e.args)
+        return {"name": service_name, "result": "failed", "error": str(e)}
+
+    log_message("INFO", "serviceSetCreatedSuccess", "service", service_name)
+    return {"name": service_name, "result": "created"}
 
 
-def delete_service(inputs, what_if=False):
+def delete_service(inputs, what_if=False, jobs=1):
     """
     Deletes a Windows service.
 
+    An array of services is deleted by `delete_services` instead.
+
     Args:
         inputs (str): JSON string containing the input data. Must include a property 'name'.
         what_if (bool): If True, performs a dry run without making changes.
+        jobs (int): Number of worker threads deleting an array of services
+            or stopping the running dependents of a service.
 
     Returns:
         str: JSON string indicating success or failure.
     """
-    json_str = validate_json_input(inputs, "name")
+    json_str = validate_json_input(inputs, allow_array=True, schema=SERVICE_SCHEMA)
+    if isinstance(json_str, list):
+        return delete_services([item["name"] for item in json_str], what_if=what_if, jobs=jobs)
+
     service_name = json_str["name"]
+    manager = get_handle_manager()
+
+    if what_if:
+        print(json.dumps(_what_if_delete_result(manager, service_name)))
+        return
+
+    result = _remove_service(manager, service_name, jobs)
+    exit(3 if result["result"] == "failed" else 0)
 
+
+def delete_services(service_names, what_if=False, jobs=1):
+    """
+    Deletes a list of services in dependency order.
+
+    Services of the batch that depend on others are deleted first, and
+    services that do not depend on each other are deleted concurrently.
+    Prints one JSON document with a result per service ('deleted' or
+    'failed') and exits with 0 if every service was deleted, or 3 otherwise.
+
+    Args:
+        service_names (list): Names of the services to delete.
+        what_if (bool): If True, prints the what-if result of every service instead.
+        jobs (int): Number of worker threads deleting independent services
+            and stopping the running dependents of each.
+    """
+    _reject_duplicate_names(service_names)
+    manager = get_handle_manager()
+    if what_if:
+        print(json.dumps([_what_if_delete_result(manager, name) for name in service_names]))
+        return
+
+    log_message("DEBUG", "serviceDeleteBatch", "service", len(service_names))
     try:
-        scm = win32service.OpenSCManager(None, None, win32service.SC_MANAGER_ALL_ACCESS)
-        service = win32service.OpenService(
-            scm, service_name, win32service.SERVICE_ALL_ACCESS
-        )
+        current_states = _fetch_current_states(service_names, jobs)
+    except scm_backend.error as e:
+        log_message("ERROR", "serviceSetBatchError", "service", str(e.args))
+        exit(3)
 
-        if what_if:
-            print(
-                json.dumps(
-                    {
-                        "name": service_name,
-                        "_metadata": {
-                            "whatIf": [
-                                f"Service '{service_name}' exists and will be deleted."
-                            ]
-                        },
-                    }
-                )
-            )
-            win32service.CloseServiceHandle(service)
-            return
+    dependencies = {}
+    for name in service_names:
+        current_service_info = current_states.get(name.lower())
+        dependencies[name] = current_service_info["dependencies"] if current_service_info else None
+    # Dependents have to go before the services they depend on
+    waves = _dependency_waves(dependencies)[::-1]
 
-        # Stop the service if it is running
-        try:
-            log_message(
-                "DEBUG",
-                _("serviceDeleteStopping", service_name),
-                "service",
-            )
-            stateCode = win32service.SERVICE_CONTROL_STOP
-            win32service.ControlService(service, stateCode)
-        except win32service.error as e:
-            if e.winerror == 1062:
-                log_message(
-                    "DEBUG",
-                    _("serviceDeleteAlreadyStopped", service_name),
-                    "service",
-                )
-            else:
+    removed = run_waves(waves, lambda name: _remove_service(manager, name, jobs), jobs)
+    results = [removed[name] for name in service_names]
+
+    print(json.dumps({"services": results}))
+    exit(3 if any(result["result"] == "failed" for result in results) else 0)
+
+
+def _reject_duplicate_names(service_names):
+    # The SCM compares names case-insensitively, so "Svc" and "svc" are one service
+    seen = set()
+    duplicates = []
+    for name in service_names:
+        if name.lower() in seen and name not in duplicates:
+            duplicates.append(name)
+        seen.add(name.lower())
+    if duplicates:
+        log_message("ERROR", "serviceDuplicateNames", "service", ", ".join(duplicates))
+        exit(4)
+
+
+def _dependency_waves(dependencies):
+    try:
+        return dependency_waves(dependencies)
+    except DependencyCycleError as e:
+        log_message("ERROR", "serviceDependencyCycle", "service", str(e))
+        exit(4)
+
+
+def _what_if_delete_result(manager, service_name):
+    try:
+        with manager.service(service_name, handles.SERVICE_ACCESS_EXISTS):
+            message = f"Service '{service_name}' exists and will be deleted."
+    except scm_backend.error:
+        message = f"Service '{service_name}' does not exist or cannot be accessed."
+    return {"name": service_name, "_metadata": {"whatIf": [message]}}
+
+
+def _remove_service(manager, service_name, jobs=1):
+    """
+    Stops a service and its running dependents, waits for it to stop and deletes it.
+
+    Running dependents are stopped over up to `jobs` worker threads.
+
+    Returns:
+        dict: The service name and its result: 'deleted' or 'failed'. Failed
+            results carry an 'error' message.
+    """
+    try:
+        with manager.service(service_name, handles.SERVICE_ACCESS_DELETE) as service:
+            # Stop the service and its dependents, and wait until it has stopped
+            try:
+                log_message("DEBUG", "serviceDeleteStopping", "service", service_name)
+                if not stop_service(manager, service_name, service, jobs=jobs):
+                    log_message("DEBUG", "serviceDeleteAlreadyStopped", "service", service_name)
+            except scm_backend.error as e:
                 log_message(
-                    "ERROR",
-                    _("serviceDeleteStopError", service_name, str(e.args)),
-                    "service",
+                    "ERROR", "serviceDeleteStopError", "service", service_name, str(e.args)
                 )
-                exit(3)
+                return {"name": service_name, "result": "failed", "error": str(e)}
 
-        log_message(
-            "DEBUG",
-            _("serviceDeleteDeleting", service_name),
-            "service",
-        )
-        win32service.DeleteService(service)
-        win32service.CloseServiceHandle(service)
-
-        log_message("INFO", _("serviceDeleteDeletedSuccess", service_name), "service")
-        exit(0)
-    except win32service.error as e:
-        if what_if:
-            print(
-                json.dumps(
-                    {
-                        "name": service_name,
-                        "_metadata": {
-                            "whatIf": [
-                                f"Service '{service_name}' does not exist or cannot be accessed."
-                            ]
-                        },
-                    }
-                )
-            )
-            return
-        log_message(
-            "ERROR", _("serviceDeleteError", service_name, str(e.args)), "service"
-        )
-        exit(3)
+            log_message("DEBUG", "serviceDeleteDeleting", "service", service_name)
+            manager.backend.delete_service(service)
 
+        log_message("INFO", "serviceDeleteDeletedSuccess", "service", service_name)
+        return {"name": service_name, "result": "deleted"}
+    except scm_backend.error as e:
+        log_message("ERROR", "serviceDeleteError", "service", service_name, str(e.args))
+        return {"name": service_name, "result": "failed", "error": str(e)}
 
-def export_services():
+
+def export_services(jobs=1, cache=None, service_filter=None, properties=None, snapshot_path=None):
     """
     Retrieves a list of all services on the system and returns them as JSON.
 
+    Args:
+        jobs (int): Number of worker threads querying service configurations.
+            A value of 1 queries the services serially.
+        cache (ExportCache): Cache of unchanged service configurations to reuse
+            and update. Every service is queried when None.
+        service_filter (ServiceFilter): Selects the services to return. All
+            services are returned when None.
+        properties (tuple): Properties to return. All properties when None.
+        snapshot_path (str): If given, the services are also written to this
+            file as an indexed snapshot for `config get --from-snapshot`.
+
     Returns:
         str: JSON string containing information about all services.
     """
     try:
-        log_message("DEBUG", _("serviceExportRetrieving"), "service")
-        services = {"services": []}
+        log_message("DEBUG", "serviceExportRetrieving", "service")
+        started = time.time()
+        records = list(iter_services(jobs, cache, service_filter, properties))
+        # Serialized straight from the records, without a dict per service
+        services = '{"services": [' + ", ".join(record.to_json(properties) for record in records) + "]}"
+        _save_export_cache(cache)
+    except Exception as e:
+        log_message("ERROR", "serviceExportError", "service", str(e))
+        exit(3)
 
-        # Open Service Control Manager
-        scm = win32service.OpenSCManager(None, None, win32service.SC_MANAGER_ALL_ACCESS)
+    if snapshot_path is not None:
+        from snapshot import build_indexed_snapshot, write_snapshot
 
-        # Enumerate Service Control Manager DB
-        statuses = win32service.EnumServicesStatus(
-            scm, win32service.SERVICE_WIN32, win32service.SERVICE_STATE_ALL
-        )
+        try:
+            write_snapshot(snapshot_path, build_indexed_snapshot(records, properties, started))
+        except OSError as e:
+            log_message("WARNING", "snapshotSaveError", "snapshot", snapshot_path, str(e))
+    return services
 
-        for service_name, display_name, service_info in statuses:
-            try:
-                service = win32service.OpenService(
-                    scm, service_name, win32service.SERVICE_QUERY_CONFIG
-                )
-                config = win32service.QueryServiceConfig(service)
-                description = win32service.QueryServiceConfig2(
-                    service, win32service.SERVICE_CONFIG_DESCRIPTION
-                )
-                win32service.CloseServiceHandle(service)
-
-                service_info = {
-                    "name": service_name,
-                    "path": config[3],
-                    "startupType": get_start_type_description(config[1]),
-                    "logon": config[7],
-                    "state": get_service_status(scm, service_name),
-                    "displayName": display_name,
-                    "description": description,
-                    "dependencies": config[6],
-                }
-                services["services"].append(service_info)
-            except win32service.error as e:
-                log_message(
-                    "WARNING",
-                    _("serviceExportDetailError", service_name, str(e)),
-                    "service",
-                )
-        return json.dumps(services)
+
+def stream_services(jobs=1, output=None, cache=None, service_filter=None, properties=None):
+    """
+    Writes every service on the system as one JSON object per line (NDJSON).
+
+    Each line is flushed as soon as the service has been queried, so consumers
+    can start processing before the enumeration has finished.
+
+    Args:
+        jobs (int): Number of worker threads querying service configurations.
+        output (file): Stream to write to. Defaults to stdout.
+        cache (ExportCache): Cache of unchanged service configurations to reuse
+            and update.
+        service_filter (ServiceFilter): Selects the services to write.
+        properties (tuple): Properties to write. All properties when None.
+    """
+    output = output or sys.stdout
+    try:
+        log_message("DEBUG", "serviceExportStreaming", "service")
+        for record in iter_services(jobs, cache, service_filter, properties):
+            output.write(record.to_json(properties) + "\n")
+            output.flush()
+        _save_export_cache(cache)
     except Exception as e:
-        log_message("ERROR", _("serviceExportError", str(e)), "service")
+        log_message("ERROR", "serviceExportError", "service", str(e))
         exit(3)
 
 
-def what_if_service(inputs, service_name):
+def export_delta(since, jobs=1, cache=None, service_filter=None, properties=None,
+                 update_snapshot=False):
     """
-    Performs a what-if analysis on a service operation without making changes.
+    Exports only the services that changed since a previous export.
+
+    The snapshot should have been exported with the same filter and
+    properties, otherwise services outside of either show up as added or
+    removed.
 
     Args:
-    inputs (str): JSON string containing the input data.
-    service_name (str): Name of the service to analyze.
+        since (str): Path of a previous `config export` document, or of an
+            indexed snapshot written by `--save-snapshot`.
+        jobs (int): Number of worker threads querying service configurations.
+        cache (ExportCache): Cache of unchanged service configurations to reuse
+            and update.
+        service_filter (ServiceFilter): Selects the services to compare.
+        properties (tuple): Properties to compare. All properties when None.
+        update_snapshot (bool): If True, atomically replaces the snapshot with
+            the current export for the next run.
 
     Returns:
-    None: Prints JSON result and returns.
+        str: JSON string with 'added', 'removed' and 'changed' services.
     """
+    from snapshot import (
+        build_indexed_snapshot,
+        diff_services,
+        is_indexed_snapshot,
+        load_snapshot,
+        write_snapshot,
+    )
+
+    indexed = is_indexed_snapshot(since)
+    previous = load_snapshot(since)
     try:
-        current_service_info = json.loads(get_service(inputs))
-    except SystemExit as e:
-        if e.code == 3:
-            print(
-                json.dumps(
-                    {
-                        "name": service_name,
-                        "_metadata": {
-                            "whatIf": [
-                                f"Access denied while querying service '{service_name}'"
-                            ]
-                        },
-                    }
-                )
-            )
-            return
+        log_message("DEBUG", "serviceExportDelta", "service", since, len(previous))
+        started = time.time()
+        records = list(iter_services(jobs, cache, service_filter, properties))
+        _save_export_cache(cache)
     except Exception as e:
-        print(
-            json.dumps(
-                {
-                    "name": service_name,
-                    "_metadata": {
-                        "whatIf": [f"Error getting current service info: {str(e)}"]
-                    },
-                }
-            )
-        )
+        log_message("ERROR", "serviceExportError", "service", str(e))
+        exit(3)
+
+    delta = diff_services(previous, [record.to_dict(properties) for record in records], properties)
+    if update_snapshot:
+        # The snapshot keeps its format
+        if indexed:
+            document = build_indexed_snapshot(records, properties, started)
+        else:
+            document = '{"services": [' + ", ".join(record.to_json(properties) for record in records) + "]}"
+        try:
+            write_snapshot(since, document)
+        except OSError as e:
+            log_message("WARNING", "snapshotSaveError", "snapshot", since, str(e))
+    return json.dumps(delta)
+
+
+def export_machines(machines, jobs=1, service_filter=None, properties=None, output=None,
+                    stream=False):
+    """
+    Exports the services of many machines concurrently.
+
+    Each machine is enumerated with `jobs` worker threads; see `fanout.fan_out`
+    for the limits across machines. Machines that fail or time out are
+    reported with an 'error' and do not hold up the others.
+
+    Args:
+        machines (list): Machine names.
+        jobs (int): Number of worker threads per machine.
+        service_filter (ServiceFilter): Selects the services to return.
+        properties (tuple): Properties to return. All properties when None.
+        output (file): Stream to write to when streaming. Defaults to stdout.
+        stream (bool): If True, writes one JSON line per service, tagged with
+            its machine, as soon as a machine has finished.
+
+    Returns:
+        str: JSON string with a 'machines' array in the order of `machines`,
+            or None when streaming.
+    """
+    # asyncio is only imported when machines are queried
+    from fanout import fan_out
+
+    output = output or sys.stdout
+    log_message("DEBUG", "serviceExportMachines", "service", len(machines))
+
+    def export(machine):
+        return [
+            record.to_dict(properties)
+            for record in iter_services(jobs, None, service_filter, properties, machine)
+        ]
+
+    def write(machine, services, error):
+        lines = [{"machine": machine, "error": error}] if error is not None else [
+            {"machine": machine, **service_info} for service_info in services
+        ]
+        for line in lines:
+            output.write(json.dumps(line) + "\n")
+        output.flush()
+
+    results = fan_out(machines, export, write if stream else None)
+    if stream:
+        return None
+    return json.dumps({"machines": [_machine_result(*result) for result in results]})
+
+
+def iter_services(jobs=1, cache=None, service_filter=None, properties=None, machine_name=None):
+    """
+    Enumerates all services and yields their information as it is resolved.
+
+    Args:
+        jobs (int): Number of worker threads querying service configurations.
+            A value of 1 queries the services serially.
+        cache (ExportCache): Cache consulted before, and updated after,
+            querying the configuration of a service.
+        service_filter (ServiceFilter): Selects the services to yield. Name,
+            display name and state are checked before a service is opened,
+            startup type and logon before its description is fetched.
+        properties (tuple): Properties to query. Services are not opened at
+            all when only enumeration properties are selected.
+        machine_name (str): Machine to enumerate. None for the local host.
+
+    Yields:
+        ServiceRecord: Services in enumeration order. Services that cannot
+            be queried are logged and skipped.
+    """
+    manager = get_handle_manager(machine_name)
+
+    # Enumerate Service Control Manager DB
+    statuses = manager.backend.enum_services_status(
+        manager.scm(handles.SCM_ACCESS_ENUMERATE),
+        scm_backend.SERVICE_WIN32,
+        scm_backend.SERVICE_STATE_ALL,
+    )
+
+    if service_filter is not None:
+        statuses = filter(lambda entry: _matches_enumeration(service_filter, cache, *entry), statuses)
+
+    profiler = get_profiler()
+
+    def query(entry):
+        if profiler is None:
+            return _query_exported_service(manager, cache, service_filter, properties, *entry)
+        started = time.perf_counter()
+        try:
+            return _query_exported_service(manager, cache, service_filter, properties, *entry)
+        finally:
+            profiler.record_service(entry[0], time.perf_counter() - started)
+
+    yield from (info for info in _map_services(query, statuses, jobs) if info is not None)
+
+
+def _map_services(function, items, jobs):
+    """
+    Lazily applies a function to every item, over a thread pool if jobs > 1.
+
+    Results are yielded in the order of the items.
+    """
+    if jobs > 1:
+        from concurrent.futures import ThreadPoolExecutor
+
+        log_message("DEBUG", "serviceExportParallel", "service", jobs)
+        # Workers share the SCM handle; map keeps the enumeration order
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            yield from executor.map(function, items)
+    else:
+        yield from map(function, items)
+
+
+def _matches_enumeration(service_filter, cache, service_name, display_name, status):
+    matches = service_filter.matches_enumeration(
+        {
+            "name": service_name,
+            "displayName": display_name,
+            "state": get_service_state_description(status[1]),
+        }
+    )
+    if not matches and cache is not None:
+        # Filtered out, but still installed: keep its cache entry
+        cache.keep(service_name)
+    return matches
+
+
+def _save_export_cache(cache):
+    if cache is None:
         return
-    if (
-        not current_service_info.get("name")
-        or current_service_info.get("_exist") is False
-    ):
-        # Service does not exist
-        print(
-            json.dumps(
-                {
-                    "name": service_name,
-                    "_metadata": {
-                        "whatIf": [
-                            f"Service '{service_name}' does not exist, will be created"
-                        ]
-                    },
-                }
+    log_message("DEBUG", "serviceExportCacheStats", "service", cache.hits, cache.misses)
+    try:
+        cache.save()
+    except OSError as e:
+        log_message("WARNING", "serviceExportCacheSaveError", "service", cache.path, str(e))
+
+
+def _query_exported_service(manager, cache, service_filter, properties, service_name, display_name, status):
+    """
+    Queries the configuration of a single enumerated service.
+
+    Args:
+        manager (HandleManager): Handle manager of the backend to query.
+        cache (ExportCache): Cache of unchanged configurations, or None.
+        service_filter (ServiceFilter): Filter on the configuration, or None.
+        properties (tuple): Properties that will be serialized. Only the SCM
+            calls they need are made; the other record attributes stay None.
+        service_name (str): Name of the service.
+        display_name (str): Display name returned by the enumeration.
+        status (tuple): Status tuple returned by the enumeration.
+
+    Returns:
+        ServiceRecord or None: The service, or None if it could not be queried
+            or does not match the filter.
+    """
+    # The enumeration already carries the name, display name and current
+    # status of every service, so only the configuration needs a handle.
+    need_config = needs(properties, CONFIG_PROPERTIES) or (
+        service_filter is not None and service_filter.needs_config
+    )
+    need_description = needs(properties, DESCRIPTION_PROPERTIES)
+    if not need_config and not need_description:
+        if cache is not None:
+            # Not queried, but still installed: keep its cache entry
+            cache.keep(service_name)
+        return ServiceRecord.from_config(service_name, status=status, display_name=display_name)
+
+    backend = manager.backend
+    change_time = None
+    if cache is not None:
+        change_time = backend.get_service_change_time(service_name)
+        cached = cache.lookup(service_name, change_time)
+        if cached is not None:
+            if service_filter is not None and not service_filter.matches_config(cached):
+                return None
+            return ServiceRecord(
+                service_name,
+                cached["path"],
+                cached["startupType"],
+                cached["logon"],
+                get_service_state_description(status[1]),
+                display_name,
+                cached["description"],
+                cached["dependencies"],
             )
+
+    config = description = None
+    try:
+        with manager.service(service_name, handles.SERVICE_ACCESS_EXPORT) as service:
+            if need_config:
+                config = backend.query_service_config(service)
+                if service_filter is not None and not service_filter.matches_config(
+                    ServiceRecord.from_config(service_name, config)
+                ):
+                    return None
+            if need_description:
+                description = backend.query_service_config2(
+                    service, scm_backend.SERVICE_CONFIG_DESCRIPTION
+                )
+    except scm_backend.error as e:
+        log_message(
+            "WARNING",
+            "serviceExportDetailError",
+            "service",
+            service_name,
+            str(e),
         )
-        return
+        return None
 
-    # Service exists, compare properties
-    properties_to_check = [
-        "path",
-        "startupType",
-        "displayName",
-        "description",
-        "dependencies",
-        "logon",
-    ]
+    record = ServiceRecord.from_config(service_name, config, description, status, display_name)
+    if cache is not None and need_config and need_description:
+        cache.store(service_name, change_time, record)
+    return record
+
+
+def what_if_service(desired):
+    """
+    Performs a what-if analysis on a service operation without making changes.
+
+    Args:
+        desired (dict): Validated desired state of the service.
+
+    Returns:
+        None: Prints JSON result and returns.
+    """
+    service_name = desired["name"]
+    manager = get_handle_manager()
+    try:
+        manager.scm(handles.SCM_ACCESS_CONNECT)
+        current_service_info = _query_service(manager, service_name)
+    except scm_backend.error:
+        current_service_info = None
+    print(json.dumps(_what_if_result(desired, current_service_info)))
 
-    loadedJson = json.loads(inputs)
 
-    # Use the helper function to record changes
-    changes = record_changes(current_service_info, loadedJson, properties_to_check)
+def _what_if_result(desired, current_service_info):
+    """
+    Builds the what-if result of a single service.
+
+    Args:
+        desired (dict): Desired state of the service.
+        current_service_info (dict): Current state as returned by `_query_service`,
+            or None if the SCM could not be queried.
+
+    Returns:
+        dict: The state the service would have after the operation.
+    """
+    service_name = desired["name"]
+    if current_service_info is None:
+        return {
+            "name": service_name,
+            "_metadata": {
+                "whatIf": [f"Access denied while querying service '{service_name}'"]
+            },
+        }
+    if current_service_info.get("_exist") is False:
+        # Service does not exist
+        return {
+            "name": service_name,
+            "_metadata": {
+                "whatIf": [f"Service '{service_name}' does not exist, will be created"]
+            },
+        }
+
+    # Service exists, compare properties
+    changes = record_changes(current_service_info, desired, PLANNED_PROPERTIES)
 
     # Prepare the result dictionary with all required properties
     result = {"name": service_name, "path": current_service_info.get("path")}
@@ -371,12 +942,98 @@ def what_if_service(inputs, service_name):
             result[prop] = change_info["desired"]
 
         # Return the result as plain JSON
-        print(json.dumps(result))
-        return
+        return result
 
-    else:
-        # No changes needed, return the current service info
-        if "_exist" in current_service_info:
-            del current_service_info["_exist"]
-        print(json.dumps(current_service_info))
-        return
+    # No changes needed, return the current service info
+    return current_service_info
+
+
+def plan_services(desired_states, jobs=1):
+    """
+    Plans how a list of desired states would change the services on the system.
+
+    The current state of every service is fetched in one pass: a single
+    enumeration tells which services exist, and only those are queried, over
+    `jobs` worker threads. The desired states are then compared in memory.
+
+    Args:
+        desired_states (list): Validated desired state objects.
+        jobs (int): Number of worker threads querying service configurations.
+
+    Returns:
+        dict: The plan. `services` holds one entry per desired state with its
+            `action` ('create', 'update', 'unchanged' or 'failed') and, for
+            creates and updates, the `changes` per property with the current
+            and desired value. `summary` counts the entries per action.
+    """
+    log_message("DEBUG", "servicePlanBatch", "service", len(desired_states))
+    try:
+        current_states = _fetch_current_states(
+            [desired["name"] for desired in desired_states], jobs
+        )
+    except scm_backend.error as e:
+        log_message("ERROR", "serviceSetBatchError", "service", str(e.args))
+        exit(3)
+
+    services = [
+        _plan_service(desired, current_states.get(desired["name"].lower(), _NOT_INSTALLED))
+        for desired in desired_states
+    ]
+    summary = {action: 0 for action in PLAN_ACTIONS}
+    for entry in services:
+        summary[entry["action"]] += 1
+    return {"services": services, "summary": summary}
+
+
+def _fetch_current_states(service_names, jobs=1):
+    """
+    Queries the current state of the given services with a single enumeration.
+
+    Drivers are enumerated too, as `set` and `delete` accept any service name;
+    leaving them out would plan an existing driver as a new service.
+
+    Returns:
+        dict: Lower-cased names of the installed services mapped to their
+            information, or to None if they could not be queried.
+    """
+    manager = get_handle_manager()
+    wanted = {name.lower() for name in service_names}
+    statuses = manager.backend.enum_services_status(
+        manager.scm(handles.SCM_ACCESS_ENUMERATE),
+        scm_backend.SERVICE_WIN32 | scm_backend.SERVICE_DRIVER,
+        scm_backend.SERVICE_STATE_ALL,
+    )
+    installed = [entry for entry in statuses if entry[0].lower() in wanted]
+
+    def query(entry):
+        return _query_exported_service(manager, None, None, None, *entry)
+
+    results = _map_services(query, installed, jobs)
+    return {entry[0].lower(): info for entry, info in zip(installed, results)}
+
+
+_NOT_INSTALLED = object()
+
+
+def _plan_service(desired, current_service_info):
+    """
+    Compares the desired state of a service with its current state.
+    """
+    service_name = desired["name"]
+    if current_service_info is _NOT_INSTALLED:
+        changes = {
+            prop: {"current": None, "desired": change["desired"]}
+            for prop, change in record_changes({}, desired, PLANNED_PROPERTIES).items()
+        }
+        return {"name": service_name, "action": "create", "changes": changes}
+    if current_service_info is None:
+        return {
+            "name": service_name,
+            "action": "failed",
+            "error": _("servicePlanQueryError", service_name),
+        }
+
+    changes = record_changes(current_service_info, desired, PLANNED_PROPERTIES)
+    if not changes:
+        return {"name": service_name, "action": "unchanged"}
+    return {"name": service_name, "action": "update", "changes": changes}
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import threading
+
+CACHE_VERSION = 1
+CACHE_FILE_NAME = "export-cache.json"
+
+# Exported properties that come from the service configuration and can be
+# reused while the configuration has not changed. The state always comes from
+# the enumeration and the display name is returned by it as well.
+CACHED_PROPERTIES = ("path", "startupType", "logon", "description", "dependencies")
+
+
+def get_default_cache_path():
+    """
+    Returns the default location of the export cache.
+    """
+    base_dir = os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()
+    return os.path.join(base_dir, "win32service", CACHE_FILE_NAME)
+
+
+class ExportCache:
+    """
+    On-disk cache of exported service configurations.
+
+    Every entry carries the change signal of its service at the time it was
+    queried (the last write time of the service registry key). An entry is
+    only used while the signal is unchanged, so repeated exports re-query the
+    services whose configuration changed and nothing else.
+
+    Args:
+        path (str): File the cache is loaded from and saved to.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_default_cache_path()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Loads the cache file. A missing, unreadable or outdated file leaves the cache empty.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return self
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+            self.entries = data.get("services", {})
+        return self
+
+    def lookup(self, service_name, change_time):
+        """
+        Returns the cached properties of a service, or None if they may be stale.
+        """
+        with self._lock:
+            self._seen.add(service_name)
+            entry = self.entries.get(service_name)
+            if change_time is not None and entry and entry["changeTime"] == change_time:
+                self.hits += 1
+                return entry["properties"]
+            self.misses += 1
+            return None
+
+    def keep(self, service_name):
+        """
+        Marks a service as still installed without looking it up.
+        """
+        with self._lock:
+            self._seen.add(service_name)
+
+    def store(self, service_name, change_time, service_info):
+        """
+        Records the exported properties of a service.
+        """
+        if change_time is None:
+            return
+        with self._lock:
+            self.entries[service_name] = {
+                "changeTime": change_time,
+                "properties": {key: service_info.get(key) for key in CACHED_PROPERTIES},
+            }
+
+    def save(self):
+        """
+        Writes the cache atomically, dropping services that were not seen since loading.
+        """
+        with self._lock:
+            services = {
+                name: entry for name, entry in self.entries.items() if name in self._seen
+            }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory or None, prefix=".export-cache-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump({"version": CACHE_VERSION, "services": services}, fp, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
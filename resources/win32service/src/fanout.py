@@ -0,0 +1,82 @@
+import asyncio
+import threading
+
+from localization import _
+from service_helpers import log_message
+
+# Machines queried at the same time
+DEFAULT_MAX_MACHINES = 16
+# Seconds a machine may take before its result is given up on
+DEFAULT_MACHINE_TIMEOUT = 60.0
+
+
+def fan_out(machines, work, on_result=None, max_machines=DEFAULT_MAX_MACHINES,
+            timeout=DEFAULT_MACHINE_TIMEOUT):
+    """
+    Runs blocking work for many machines concurrently.
+
+    Every machine is handled in its own thread, at most `max_machines` at a
+    time, and given up on after `timeout` seconds so slow or unreachable
+    machines do not hold up the others.
+
+    Args:
+        machines (list): Machine names.
+        work (callable): Called with a machine name; returns its result.
+        on_result (callable): Called with (machine, result, error) as soon as a
+            machine has finished, in completion order.
+        max_machines (int): Global limit of machines in flight.
+        timeout (float): Seconds per machine.
+
+    Returns:
+        list: (machine, result, error) tuples in the order of `machines`.
+            `error` is None on success, otherwise a message and `result` is None.
+    """
+    return asyncio.run(_fan_out(machines, work, on_result, max_machines, timeout))
+
+
+async def _fan_out(machines, work, on_result, max_machines, timeout):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_machines)
+
+    async def run(machine):
+        async with semaphore:
+            try:
+                outcome = (machine, await asyncio.wait_for(_run_in_thread(loop, work, machine), timeout), None)
+            except asyncio.TimeoutError:
+                outcome = (machine, None, _("machineTimeout", timeout))
+            except Exception as e:
+                outcome = (machine, None, str(e))
+        if outcome[2] is not None:
+            log_message("WARNING", "machineFailed", "fanout", machine, outcome[2])
+        if on_result is not None:
+            on_result(*outcome)
+        return outcome
+
+    return await asyncio.gather(*(run(machine) for machine in machines))
+
+
+def _run_in_thread(loop, function, *args):
+    # A daemon thread rather than a ThreadPoolExecutor: pool workers are joined
+    # at exit, so an RPC hanging on a dead machine would hold the process open
+    # long after its result was given up on.
+    future = loop.create_future()
+
+    def resolve(setter, value):
+        if not future.done():
+            setter(value)
+
+    def target():
+        try:
+            result = function(*args)
+        except BaseException as e:
+            outcome = (future.set_exception, e)
+        else:
+            outcome = (future.set_result, result)
+        try:
+            loop.call_soon_threadsafe(resolve, *outcome)
+        except RuntimeError:
+            # The loop has finished: the result was given up on
+            pass
+
+    threading.Thread(target=target, daemon=True).start()
+    return future
@@ -0,0 +1,170 @@
+import atexit
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import scm_backend
+
+# Minimal access rights needed by each operation
+SCM_ACCESS_CONNECT = scm_backend.SC_MANAGER_CONNECT
+SCM_ACCESS_ENUMERATE = scm_backend.SC_MANAGER_CONNECT | scm_backend.SC_MANAGER_ENUMERATE_SERVICE
+SCM_ACCESS_CREATE = scm_backend.SC_MANAGER_CONNECT | scm_backend.SC_MANAGER_CREATE_SERVICE
+
+SERVICE_ACCESS_GET = scm_backend.SERVICE_QUERY_CONFIG | scm_backend.SERVICE_QUERY_STATUS
+SERVICE_ACCESS_EXPORT = scm_backend.SERVICE_QUERY_CONFIG
+SERVICE_ACCESS_CREATE = scm_backend.SERVICE_QUERY_STATUS
+SERVICE_ACCESS_UPDATE = scm_backend.SERVICE_CHANGE_CONFIG
+SERVICE_ACCESS_EXISTS = scm_backend.SERVICE_QUERY_STATUS
+SERVICE_ACCESS_STOP = (
+    scm_backend.SERVICE_STOP
+    | scm_backend.SERVICE_QUERY_STATUS
+    | scm_backend.SERVICE_ENUMERATE_DEPENDENTS
+)
+SERVICE_ACCESS_DELETE = SERVICE_ACCESS_STOP | scm_backend.DELETE
+
+
+class HandleManager:
+    """
+    Opens, caches and closes the SCM and service handles of a backend.
+
+    SCM connections are cached per access mask and reused by every operation
+    that needs no more rights than the cached connection has. Service handles
+    are only handed out through context managers, so they are closed on every
+    path. `opened` and `closed` count handles by kind ("scm" or "service").
+
+    Args:
+        backend (ScmBackend): Backend to open handles with.
+        machine_name (str): Remote machine to connect to. None for the local host.
+    """
+
+    def __init__(self, backend, machine_name=None):
+        self.backend = backend
+        self.machine_name = machine_name
+        self.opened = Counter()
+        self.closed = Counter()
+        self._scm_handles = {}
+        self._lock = threading.Lock()
+
+    def scm(self, access=SCM_ACCESS_CONNECT):
+        """
+        Returns an SCM handle with at least the requested access rights.
+        """
+        with self._lock:
+            for mask, handle in self._scm_handles.items():
+                if mask & access == access:
+                    return handle
+            handle = self.backend.open_sc_manager(self.machine_name, None, access)
+            self._scm_handles[access] = handle
+            self.opened["scm"] += 1
+            return handle
+
+    @contextmanager
+    def service(self, service_name, access, scm_access=SCM_ACCESS_CONNECT):
+        """
+        Opens a service handle with the requested access and closes it on exit.
+        """
+        handle = self.backend.open_service(self.scm(scm_access), service_name, access)
+        self._count("opened", "service")
+        try:
+            yield handle
+        finally:
+            self.close_service(handle)
+
+    def create_service(self, service_name, display_name, service_type, start_type,
+                       error_control, binary_path, dependencies, username, password):
+        """
+        Creates a service and closes the handle the SCM returns for it.
+        """
+        handle = self.backend.create_service(
+            self.scm(SCM_ACCESS_CREATE),
+            service_name,
+            display_name,
+            SERVICE_ACCESS_CREATE,
+            service_type,
+            start_type,
+            error_control,
+            binary_path,
+            None,
+            False,
+            dependencies,
+            username,
+            password,
+        )
+        self._count("opened", "service")
+        self.close_service(handle)
+
+    def close_service(self, handle):
+        self.backend.close_service_handle(handle)
+        self._count("closed", "service")
+
+    def close(self):
+        """
+        Closes every cached SCM handle.
+        """
+        with self._lock:
+            handles, self._scm_handles = list(self._scm_handles.values()), {}
+        for handle in handles:
+            try:
+                self.backend.close_service_handle(handle)
+            except scm_backend.error:
+                pass
+            self._count("closed", "scm")
+
+    def stats(self):
+        """
+        Returns the number of opened, closed and still open handles by kind.
+        """
+        return {
+            kind: {
+                "opened": self.opened[kind],
+                "closed": self.closed[kind],
+                "open": self.opened[kind] - self.closed[kind],
+            }
+            for kind in ("scm", "service")
+        }
+
+    def _count(self, counter, kind):
+        with self._lock:
+            getattr(self, counter)[kind] += 1
+
+
+_managers = {}
+_managers_backend = None
+_managers_lock = threading.Lock()
+
+
+def get_handle_manager(machine_name=None):
+    """
+    Returns the process-wide handle manager of a machine on the current backend.
+
+    All managers are closed and new ones created when the backend has been
+    replaced.
+
+    Args:
+        machine_name (str): Remote machine to manage handles on. None for the local host.
+    """
+    global _managers_backend
+    backend = scm_backend.get_backend()
+    with _managers_lock:
+        if _managers_backend is not backend:
+            for manager in _managers.values():
+                manager.close()
+            _managers.clear()
+            _managers_backend = backend
+        manager = _managers.get(machine_name)
+        if manager is None:
+            manager = _managers[machine_name] = HandleManager(backend, machine_name)
+        return manager
+
+
+def close_handles():
+    """
+    Closes the handles of the process-wide managers.
+    """
+    with _managers_lock:
+        managers = list(_managers.values())
+    for manager in managers:
+        manager.close()
+
+
+atexit.register(close_handles)
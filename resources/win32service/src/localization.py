@@ -1,87 +1,200 @@
-import gettext
+import json
 import os
-import locale
 import sys
 
-def setup_localization():
+DEFAULT_LANGUAGE = "en-us"
+CATALOG_EXTENSION = ".json"
+
+_templates = None
+
+
+def get_locale_dir():
     """
-    Sets up localization for the application.
-    Returns the translation function '_'.
+    Returns the directory holding the message catalogs.
     """
     # Handle different runtime environments
     if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
         # Running from PyInstaller bundle
-        base_path = sys._MEIPASS
-        locale_dir = os.path.join(base_path, 'locales')
-    else:
-        # Running in development mode
-        src_dir = os.path.dirname(__file__)
-        project_root = os.path.dirname(src_dir)  # Go up one level from src
-        locale_dir = os.path.join(project_root, 'locales')
-    
-    
-    current_lang_code = None
+        return os.path.join(sys._MEIPASS, 'locales')
+
+    # Running in development mode
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(src_dir)  # Go up one level from src
+    return os.path.join(project_root, 'locales')
 
+
+def get_language():
+    """
+    Detects the language code of the current user, e.g. 'en-us'.
+    """
     try:
         env_lang = os.environ.get('LANG')
         if env_lang:
             # Strip off any encoding part (e.g., .utf-8, .iso8859-1)
             env_lang = env_lang.split('.')[0]
             # Normalize: lowercase, replace underscore with hyphen
-            normalized_lang = env_lang.lower().replace('_', '-')
-            current_lang_code = normalized_lang
-        else:
-            loc = locale.getdefaultlocale()
-            if loc and loc[0]:
-                normalized_loc = loc[0].lower().replace('_', '-')
-                current_lang_code = normalized_loc.split('.')[0]
+            return env_lang.lower().replace('_', '-')
+
+        import locale
+
+        loc = locale.getdefaultlocale()
+        if loc and loc[0]:
+            return loc[0].lower().replace('_', '-').split('.')[0]
     except Exception:
         pass
 
-    if not current_lang_code:
-        current_lang_code = 'en-us'  # Default to English (US)
-    
-    mo_filename = f"{current_lang_code}.mo"
-    mo_file_path = os.path.join(locale_dir, mo_filename)
+    return DEFAULT_LANGUAGE
+
+
+def get_language_chain(language):
+    """
+    Returns the languages to look messages up in, most specific first.
+
+    For example 'de-at' yields ['de-at', 'de', 'en-us'].
+    """
+    chain = []
+    parts = language.split('-')
+    for length in range(len(parts), 0, -1):
+        code = '-'.join(parts[:length])
+        if code and code not in chain:
+            chain.append(code)
+    if DEFAULT_LANGUAGE not in chain:
+        chain.append(DEFAULT_LANGUAGE)
+    return chain
+
+
+def parse_po_file(po_file_path):
+    """
+    Parses a gettext .po file into a dictionary of message IDs to translations.
+
+    Untranslated entries and the header are left out so lookups fall through to
+    the next language in the chain.
+    """
+    messages = {}
+    entry = {}
+    field = None
+
+    def flush():
+        if entry.get('msgid') and entry.get('msgstr'):
+            messages[entry['msgid']] = entry['msgstr']
+        entry.clear()
+
+    with open(po_file_path, encoding='utf-8') as fp:
+        for line in fp:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('msgid '):
+                flush()
+                field, line = 'msgid', line[len('msgid '):]
+            elif line.startswith('msgstr '):
+                field, line = 'msgstr', line[len('msgstr '):]
+            elif not line.startswith('"') or field is None:
+                continue
+            # PO strings use C escapes, which JSON string literals share
+            entry[field] = entry.get(field, '') + json.loads(line)
+    flush()
+
+    return messages
+
+
+def compile_catalogs(locale_dir=None):
+    """
+    Compiles every .po file in the locale directory into a JSON lookup table.
+
+    Returns:
+        list: Paths of the written catalogs.
+    """
+    locale_dir = locale_dir or get_locale_dir()
+    written = []
+    for file_name in sorted(os.listdir(locale_dir)):
+        base_name, extension = os.path.splitext(file_name)
+        if extension != '.po':
+            continue
+        catalog_path = os.path.join(locale_dir, base_name + CATALOG_EXTENSION)
+        messages = parse_po_file(os.path.join(locale_dir, file_name))
+        with open(catalog_path, 'w', encoding='utf-8') as fp:
+            json.dump(messages, fp, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        written.append(catalog_path)
+    return written
+
+
+def load_catalog(language, locale_dir=None):
+    """
+    Loads the messages of a single language.
+
+    The compiled catalog is preferred; the .po source is parsed when running
+    from a checkout that has not been built.
+
+    Returns:
+        dict: Message IDs to templates. Empty if the language is not available.
+    """
+    locale_dir = locale_dir or get_locale_dir()
+    catalog_path = os.path.join(locale_dir, language + CATALOG_EXTENSION)
+    try:
+        with open(catalog_path, encoding='utf-8') as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        pass
+
+    po_file_path = os.path.join(locale_dir, language + '.po')
+    try:
+        return parse_po_file(po_file_path)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_templates(language=None, locale_dir=None):
+    """
+    Builds the message lookup table for a language including its fallbacks.
+    """
+    templates = {}
+    for code in reversed(get_language_chain(language or get_language())):
+        templates.update(load_catalog(code, locale_dir))
+    return templates
+
 
-    if os.path.exists(mo_file_path):
+def reset_localization():
+    """
+    Drops the loaded catalog so the next message is looked up afresh.
+    """
+    global _templates
+    _templates = None
+
+
+def _(message_id, *args):
+    """
+    Get a message by its ID and format it with the given arguments.
+
+    The catalog is loaded on the first call, so processes that never print a
+    message do not pay for it.
+
+    Args:
+        message_id: The camelCase ID of the message
+        *args: Format arguments for the message
+
+    Returns:
+        str: The translated and formatted message, or the message ID if no
+            translation exists.
+    """
+    global _templates
+    if _templates is None:
+        _templates = load_templates()
+
+    # Get the translated text
+    text = _templates.get(message_id, message_id)
+
+    # Format if arguments are provided
+    if args:
         try:
-            with open(mo_file_path, 'rb') as fp:
-                lang_translation = gettext.GNUTranslations(fp)
-            
-            # Create the translation lookup function
-            def translate(message_id, *args):
-                """
-                Get a message by its ID and format it with the given arguments.
-                
-                Args:
-                    message_id: The camelCase ID of the message
-                    *args: Format arguments for the message
-                
-                Returns:
-                    str: The translated and formatted message
-                """
-                # Get the translated text
-                text = lang_translation.gettext(message_id)
-                
-                # Format if arguments are provided
-                if args:
-                    try:
-                        text = text.format(*args)
-                    except IndexError:
-                        pass
-                
-                return text
-            
-            return translate
-            
-        except Exception:
+            text = text.format(*args)
+        except IndexError:
             pass
-    
-    # Fallback: return a function that just returns the message ID as-is
-    def identity_translate(message_id, *args):
-        return message_id if not args else message_id.format(*args)
-    
-    return identity_translate
-
-_ = setup_localization()
+
+    return text
+
+
+if __name__ == '__main__':
+    # Build step: precompile the catalogs shipped with the executable
+    for path in compile_catalogs():
+        print(path)
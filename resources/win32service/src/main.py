@@ -1,34 +1,94 @@
-from caps import get_service, set_service, delete_service, export_services
+import sys
+
 from args import create_parser
-from service_helpers import log_message, get_service_schema
-from localization import _
+
+
+def _start_profiling(args):
+    # SCM calls are timed with --profile, or when tracing so the summary can be logged
+    from service_helpers import LOG_LEVELS, get_log_level
+
+    if args.profile or get_log_level() == LOG_LEVELS["TRACE"]:
+        from profiler import enable_profiling
+
+        enable_profiling(args.profile)
+
 
 if __name__ == "__main__":
     parser = create_parser()
 
     args = parser.parse_args()
 
+    # Commands import only the modules they use to keep start-up cheap
     if args.config == "config":
+        from caps import (
+            get_service,
+            set_service,
+            delete_service,
+            export_delta,
+            export_services,
+            export_machines,
+            stream_services,
+        )
+        from service_helpers import log_message
+
+        _start_profiling(args)
+
         if args.action == "get":
-            log_message(
-                "INFO", _("logGetService", args.input), "service"
-            )
-            print(get_service(args.input))
+            log_message("INFO", "logGetService", "service", args.input)
+            print(get_service(args.input, snapshot_path=args.from_snapshot))
         elif args.action == "set":
-            log_message(
-                "INFO", _("logSetService", args.input), "service"
-            )
-            set_service(args.input, what_if=args.what_if)
+            log_message("INFO", "logSetService", "service", args.input)
+            set_service(args.input, what_if=args.what_if, jobs=args.jobs)
         elif args.action == "delete":
-            log_message(
-                "INFO", _("logDeleteService", args.input), "service"
-            )
-            delete_service(args.input, what_if=args.what_if)
+            log_message("INFO", "logDeleteService", "service", args.input)
+            delete_service(args.input, what_if=args.what_if, jobs=args.jobs)
         elif args.action == "export":
-            log_message(
-                "INFO", _("logExportServices"), "service"
-            )
-            print(export_services())
+            log_message("INFO", "logExportServices", "service")
+            cache = None
+            # The cache is opt-in and only covers the local machine
+            if (args.cache or args.cache_file) and not args.machines:
+                from export_cache import ExportCache
+
+                cache = ExportCache(args.cache_file)
+                if not args.refresh:
+                    cache.load()
+            service_filter = None
+            if args.filter:
+                from service_filter import parse_filter
+
+                service_filter = parse_filter(args.filter)
+            from projection import parse_properties
+
+            properties = parse_properties(args.properties)
+            export_args = {
+                "jobs": args.jobs,
+                "service_filter": service_filter,
+                "properties": properties,
+            }
+            for option, value in (("--since", args.since), ("--save-snapshot", args.save_snapshot)):
+                if value and (args.machines or args.stream):
+                    log_message("ERROR", "exportOptionUnsupported", "service", option, "--machines, --stream")
+                    sys.exit(4)
+            if args.since and args.save_snapshot:
+                log_message("ERROR", "exportOptionUnsupported", "service", "--save-snapshot", "--since")
+                sys.exit(4)
+            if args.since:
+                print(export_delta(args.since, cache=cache, update_snapshot=args.update_snapshot, **export_args))
+            elif args.machines:
+                machines = [name.strip() for name in args.machines.split(",") if name.strip()]
+                result = export_machines(machines, stream=args.stream, **export_args)
+                if result is not None:
+                    print(result)
+            elif args.stream:
+                stream_services(cache=cache, **export_args)
+            else:
+                print(export_services(cache=cache, snapshot_path=args.save_snapshot, **export_args))
     elif args.config == "schema":
-        schema = get_service_schema()
-        print(str(schema))
\ No newline at end of file
+        from schema import SERVICE_SCHEMA_JSON
+
+        print(SERVICE_SCHEMA_JSON)
+    elif args.config == "serve":
+        from server import serve
+
+        _start_profiling(args)
+        serve()
@@ -0,0 +1,159 @@
+import abc
+import atexit
+import json
+import threading
+import time
+
+import scm_backend
+from service_helpers import log_message
+
+# Backend methods and the pywin32 calls they stand for
+CALL_NAMES = {
+    "open_sc_manager": "OpenSCManager",
+    "open_service": "OpenService",
+    "close_service_handle": "CloseServiceHandle",
+    "enum_services_status": "EnumServicesStatus",
+    "enum_dependent_services": "EnumDependentServices",
+    "query_service_config": "QueryServiceConfig",
+    "query_service_config2": "QueryServiceConfig2",
+    "query_service_status": "QueryServiceStatus",
+    "create_service": "CreateService",
+    "change_service_config": "ChangeServiceConfig",
+    "change_service_config2": "ChangeServiceConfig2",
+    "control_service": "ControlService",
+    "delete_service": "DeleteService",
+    "get_service_change_time": "RegQueryInfoKey",
+}
+
+# Slowest services included in the TRACE record; the JSON file has all of them
+TRACE_SLOWEST_SERVICES = 20
+
+
+class ProfilingBackend(scm_backend.ScmBackend):
+    """
+    Backend wrapper timing every SCM call of the backend it wraps.
+
+    Per pywin32 call it records the number of calls, their total and maximum
+    latency and the failures by Win32 error code. Exported services can be
+    timed individually with `record_service`.
+
+    Args:
+        backend (ScmBackend): Backend whose calls are timed.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.started = time.perf_counter()
+        self.calls = {}
+        self.services = {}
+        self._lock = threading.Lock()
+
+    def _call(self, call, method, args):
+        started = time.perf_counter()
+        failure = None
+        try:
+            return method(*args)
+        except scm_backend.error as e:
+            failure = getattr(e, "winerror", None)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stats = self.calls.setdefault(
+                    call, {"count": 0, "totalSeconds": 0.0, "maxSeconds": 0.0, "failures": {}}
+                )
+                stats["count"] += 1
+                stats["totalSeconds"] += elapsed
+                stats["maxSeconds"] = max(stats["maxSeconds"], elapsed)
+                if failure is not None:
+                    stats["failures"][str(failure)] = stats["failures"].get(str(failure), 0) + 1
+
+    def record_service(self, service_name, seconds):
+        """
+        Records the time spent on a single service of an export.
+        """
+        with self._lock:
+            self.services[service_name] = seconds
+
+    def summary(self, slowest=None):
+        """
+        Returns the recorded timings.
+
+        Args:
+            slowest (int): Number of slowest services to include. All when None.
+
+        Returns:
+            dict: Wall time, time spent in SCM calls, statistics per call and
+                the timed services, slowest first.
+        """
+        with self._lock:
+            calls = {call: dict(stats, failures=dict(stats["failures"])) for call, stats in self.calls.items()}
+            services = sorted(self.services.items(), key=lambda item: item[1], reverse=True)
+        return {
+            "wallSeconds": time.perf_counter() - self.started,
+            "scmSeconds": sum(stats["totalSeconds"] for stats in calls.values()),
+            "calls": calls,
+            "services": [
+                {"name": name, "seconds": seconds} for name, seconds in services[:slowest]
+            ],
+        }
+
+
+def _profiled(method_name, call):
+    def method(self, *args):
+        return self._call(call, getattr(self.backend, method_name), args)
+
+    method.__name__ = method_name
+    return method
+
+
+for _method_name, _call_name in CALL_NAMES.items():
+    setattr(ProfilingBackend, _method_name, _profiled(_method_name, _call_name))
+# The methods were added after the class was created
+abc.update_abstractmethods(ProfilingBackend)
+
+
+_profiler = None
+
+
+def get_profiler():
+    """
+    Returns the active profiling backend, or None if profiling is off.
+    """
+    return _profiler
+
+
+def enable_profiling(output_path=None):
+    """
+    Wraps the process-wide backend in a `ProfilingBackend`.
+
+    The summary is emitted at exit: written to `output_path` as JSON if given,
+    otherwise logged as a TRACE record.
+
+    Returns:
+        ProfilingBackend: The active profiler.
+    """
+    global _profiler
+    _profiler = ProfilingBackend(scm_backend.get_backend())
+    scm_backend.set_backend(_profiler)
+    atexit.register(write_profile, _profiler, output_path)
+    return _profiler
+
+
+def write_profile(profiler, output_path=None):
+    """
+    Emits the summary of a profiler, after closing the handles it still tracks.
+    """
+    import handles
+
+    handles.close_handles()
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as fp:
+            json.dump(profiler.summary(), fp, indent=2)
+    else:
+        log_message(
+            "TRACE",
+            "profileSummary",
+            "profile",
+            lambda: json.dumps(profiler.summary(TRACE_SLOWEST_SERVICES)),
+        )
@@ -0,0 +1,60 @@
+from sys import exit
+
+from service_helpers import log_message
+
+# Properties of a service in the order they are emitted
+SERVICE_PROPERTIES = (
+    "name",
+    "path",
+    "startupType",
+    "logon",
+    "state",
+    "displayName",
+    "description",
+    "dependencies",
+)
+
+# Properties read with QueryServiceConfig. `get` reads the display name from
+# the configuration too; `export` has it from the enumeration.
+CONFIG_PROPERTIES = frozenset(("path", "startupType", "logon", "dependencies"))
+# Property read with QueryServiceConfig2(SERVICE_CONFIG_DESCRIPTION)
+DESCRIPTION_PROPERTIES = frozenset(("description",))
+# Property read with QueryServiceStatus by `get`; `export` has it from the enumeration
+STATUS_PROPERTIES = frozenset(("state",))
+
+
+def parse_properties(value):
+    """
+    Parses a property projection.
+
+    Args:
+        value (list or str): Property names, as a list or comma-separated string.
+            None selects every property.
+
+    Returns:
+        tuple or None: The selected properties in output order, always including
+            the name. Exits with code 4 on unknown properties.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [name.strip() for name in value.split(",") if name.strip()]
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        log_message("ERROR", "propertiesInvalid", "input validation", value)
+        exit(4)
+
+    unknown = [name for name in value if name not in SERVICE_PROPERTIES]
+    if unknown:
+        log_message("ERROR", "propertiesUnknown", "input validation", ", ".join(unknown))
+        exit(4)
+
+    selected = set(value) | {"name"}
+    return tuple(name for name in SERVICE_PROPERTIES if name in selected)
+
+
+def needs(properties, required):
+    """
+    Returns True if the projection selects any of the given properties.
+    """
+    return properties is None or not required.isdisjoint(properties)
+
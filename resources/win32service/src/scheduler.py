@@ -0,0 +1,92 @@
+from service_helpers import log_message
+
+
+class DependencyCycleError(ValueError):
+    """
+    Raised when the services of a batch depend on each other in a cycle.
+
+    Args:
+        services (list): Names of the services on the cycle.
+    """
+
+    def __init__(self, services):
+        super().__init__(", ".join(services))
+        self.services = services
+
+
+def dependency_waves(dependencies):
+    """
+    Orders services so that every service comes after the services it depends on.
+
+    Only dependencies on services of the batch are ordered; others are
+    assumed to be satisfied already. Names are compared case-insensitively,
+    like the SCM does.
+
+    Args:
+        dependencies (dict): Service names mapped to the names they depend on.
+
+    Returns:
+        list: Waves of service names in input order. A wave only depends on
+            the waves before it, so its services can be applied concurrently.
+
+    Raises:
+        DependencyCycleError: If some services depend on each other in a cycle.
+    """
+    names = {name.lower(): name for name in dependencies}
+    pending = {
+        key: {dependency.lower() for dependency in dependencies[name] or []} & names.keys() - {key}
+        for key, name in names.items()
+    }
+
+    waves = []
+    while pending:
+        wave = [key for key, required in pending.items() if not required]
+        if not wave:
+            raise DependencyCycleError(sorted(names[key] for key in _find_cycle(pending)))
+        for key in wave:
+            del pending[key]
+        for required in pending.values():
+            required.difference_update(wave)
+        waves.append([names[key] for key in wave])
+    return waves
+
+
+def _find_cycle(pending):
+    # Every remaining service waits for another remaining one, so following
+    # any chain of dependencies must revisit a service
+    path = []
+    key = next(iter(pending))
+    while key not in path:
+        path.append(key)
+        key = next(iter(sorted(pending[key])))
+    return path[path.index(key):]
+
+
+def run_waves(waves, function, jobs=1):
+    """
+    Calls a function for every service, one wave after the other.
+
+    The services of a wave run concurrently over up to `jobs` worker threads;
+    a wave only starts once the previous one has finished.
+
+    Args:
+        waves (list): Waves of items as returned by `dependency_waves`.
+        function (callable): Called with every item.
+        jobs (int): Number of worker threads. 1 runs everything serially.
+
+    Returns:
+        dict: Items mapped to what the function returned for them.
+    """
+    results = {}
+    if jobs <= 1:
+        for wave in waves:
+            results.update((item, function(item)) for item in wave)
+        return results
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for index, wave in enumerate(waves):
+            log_message("DEBUG", "schedulerWave", "scheduler", index + 1, len(waves), len(wave))
+            results.update(zip(wave, executor.map(function, wave)))
+    return results
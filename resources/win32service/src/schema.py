@@ -0,0 +1,93 @@
+import json
+
+# JSON schema of the service resource. Built once and serialized at import so
+# the `schema` command only has to print a constant.
+SERVICE_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "title": "win32service",
+    "type": "object",
+    "required": ["name"],
+    "properties": {
+        "_exist": {
+            "description": "Indicates whether the service already exists.",
+            "type": ["boolean", "null"],
+        },
+        "name": {
+            "description": "The name of the Windows service.",
+            "type": "string",
+        },
+        "path": {
+            "description": "The executable path of the Windows service.",
+            "type": "string",
+        },
+        "startupType": {
+            "description": "The startup type of the Windows service.",
+            "type": "string",
+            "enum": ["Automatic", "Manual", "Disabled"],
+        },
+        "logon": {
+            "description": "The account the Windows service runs as. Set through 'username'.",
+            "type": ["string", "null"],
+            "readOnly": True,
+        },
+        "state": {
+            "description": "The current state of the Windows service.",
+            "type": ["string", "null"],
+            "readOnly": True,
+        },
+        "displayName": {
+            "description": "The display name of the Windows service.",
+            "type": ["string", "null"],
+        },
+        "description": {
+            "description": "The description of the Windows service.",
+            "type": ["string", "null"],
+        },
+        "dependencies": {
+            "description": "The dependencies of the Windows service.",
+            "type": ["array", "null"],
+        },
+        "username": {
+            "description": "The username for the Windows service logon.",
+            "type": ["string", "null"],
+        },
+        "password": {
+            "description": "The password for the Windows service logon.",
+            "type": ["string", "null"],
+        },
+    },
+    "additionalProperties": False,
+}
+
+SERVICE_SCHEMA_JSON = json.dumps(SERVICE_SCHEMA, separators=(",", ":"))
+
+# Query options `config get` accepts next to the service properties. They pick
+# what to return and from which machines rather than describe the service, so
+# they are not part of the published schema and `config set`/`delete` reject
+# them.
+GET_OPTIONS = {
+    "properties": {
+        "description": "The service properties to return. All properties are returned when omitted.",
+        "type": ["array", "null"],
+        "items": {
+            "type": "string",
+            "enum": [
+                "name",
+                "path",
+                "startupType",
+                "logon",
+                "state",
+                "displayName",
+                "description",
+                "dependencies",
+            ],
+        },
+    },
+    "machines": {
+        "description": "The machines to query the service on with a single config get. The local machine when omitted.",
+        "type": ["array", "null"],
+        "items": {"type": "string"},
+    },
+}
+
+GET_INPUT_SCHEMA = {**SERVICE_SCHEMA, "properties": {**SERVICE_SCHEMA["properties"], **GET_OPTIONS}}
@@ -0,0 +1,672 @@
+import abc
+import os
+import threading
+import time
+from collections import Counter
+
+try:
+    from pywintypes import error
+except ImportError:
+    class error(Exception):
+        """
+        Stand-in for pywintypes.error on hosts without pywin32.
+
+        Carries the same (winerror, funcname, strerror) arguments so callers can
+        inspect `e.winerror` regardless of the backend that raised it.
+        """
+
+        def __init__(self, winerror, funcname=None, strerror=None):
+            super().__init__(winerror, funcname, strerror)
+            self.winerror = winerror
+            self.funcname = funcname
+            self.strerror = strerror
+
+
+# Access rights, service types and control codes as defined by winsvc.h
+SC_MANAGER_CONNECT = 0x0001
+SC_MANAGER_CREATE_SERVICE = 0x0002
+SC_MANAGER_ENUMERATE_SERVICE = 0x0004
+SC_MANAGER_ALL_ACCESS = 0xF003F
+
+SERVICE_QUERY_CONFIG = 0x0001
+SERVICE_CHANGE_CONFIG = 0x0002
+SERVICE_QUERY_STATUS = 0x0004
+SERVICE_ENUMERATE_DEPENDENTS = 0x0008
+SERVICE_START = 0x0010
+SERVICE_STOP = 0x0020
+DELETE = 0x10000
+SERVICE_ALL_ACCESS = 0xF01FF
+
+SERVICE_WIN32_OWN_PROCESS = 0x10
+SERVICE_WIN32_SHARE_PROCESS = 0x20
+SERVICE_WIN32 = SERVICE_WIN32_OWN_PROCESS | SERVICE_WIN32_SHARE_PROCESS
+SERVICE_KERNEL_DRIVER = 0x1
+SERVICE_FILE_SYSTEM_DRIVER = 0x2
+SERVICE_RECOGNIZER_DRIVER = 0x8
+SERVICE_DRIVER = SERVICE_KERNEL_DRIVER | SERVICE_FILE_SYSTEM_DRIVER | SERVICE_RECOGNIZER_DRIVER
+
+SERVICE_ACTIVE = 1
+SERVICE_INACTIVE = 2
+SERVICE_STATE_ALL = 3
+
+SERVICE_AUTO_START = 2
+SERVICE_DEMAND_START = 3
+SERVICE_DISABLED = 4
+
+SERVICE_ERROR_NORMAL = 1
+SERVICE_NO_CHANGE = 0xFFFFFFFF
+SERVICE_CONFIG_DESCRIPTION = 1
+SERVICE_CONTROL_STOP = 1
+
+SERVICE_STOPPED = 1
+SERVICE_START_PENDING = 2
+SERVICE_STOP_PENDING = 3
+SERVICE_RUNNING = 4
+
+# Win32 error codes the service operations react to
+ERROR_ACCESS_DENIED = 5
+ERROR_INVALID_HANDLE = 6
+RPC_S_SERVER_UNAVAILABLE = 1722
+ERROR_DEPENDENT_SERVICES_RUNNING = 1051
+ERROR_SERVICE_REQUEST_TIMEOUT = 1053
+ERROR_SERVICE_DOES_NOT_EXIST = 1060
+ERROR_SERVICE_CANNOT_ACCEPT_CTRL = 1061
+ERROR_SERVICE_NOT_ACTIVE = 1062
+ERROR_SERVICE_EXISTS = 1073
+
+# Registry key holding the configuration of every service
+SERVICES_REGISTRY_KEY = "SYSTEM\\CurrentControlSet\\Services"
+
+_ERROR_MESSAGES = {
+    ERROR_ACCESS_DENIED: "Access is denied.",
+    ERROR_INVALID_HANDLE: "The handle is invalid.",
+    ERROR_DEPENDENT_SERVICES_RUNNING: "A stop control has been sent to a service that other running services are dependent on.",
+    ERROR_SERVICE_REQUEST_TIMEOUT: "The service did not respond to the start or control request in a timely fashion.",
+    ERROR_SERVICE_DOES_NOT_EXIST: "The specified service does not exist as an installed service.",
+    ERROR_SERVICE_CANNOT_ACCEPT_CTRL: "The service cannot accept control messages at this time.",
+    ERROR_SERVICE_NOT_ACTIVE: "The service has not been started.",
+    ERROR_SERVICE_EXISTS: "The specified service already exists.",
+    RPC_S_SERVER_UNAVAILABLE: "The RPC server is unavailable.",
+}
+
+
+def make_error(code, call):
+    """
+    Builds the error a pywin32 call raises for a Win32 error code.
+    """
+    return error(code, call, _ERROR_MESSAGES.get(code, "Simulated SCM failure."))
+
+
+class ScmBackend(abc.ABC):
+    """
+    Interface used by the service operations to talk to a Service Control Manager.
+
+    Method names and argument order follow the pywin32 `win32service` functions of
+    the same name so that backends can be swapped without touching the callers.
+    A backend missing one of them cannot be instantiated.
+    """
+
+    @abc.abstractmethod
+    def open_sc_manager(self, machine_name, database_name, desired_access):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def open_service(self, scm_handle, service_name, desired_access):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def close_service_handle(self, handle):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def enum_services_status(self, scm_handle, service_type, service_state):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_service_config(self, service_handle):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_service_config2(self, service_handle, info_level):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_service_status(self, service_handle):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def enum_dependent_services(self, service_handle, service_state):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def create_service(
+        self,
+        scm_handle,
+        service_name,
+        display_name,
+        desired_access,
+        service_type,
+        start_type,
+        error_control,
+        binary_path,
+        load_order_group,
+        fetch_tag,
+        dependencies,
+        username,
+        password,
+    ):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def change_service_config(
+        self,
+        service_handle,
+        service_type,
+        start_type,
+        error_control,
+        binary_path,
+        load_order_group,
+        fetch_tag,
+        dependencies,
+        username,
+        password,
+        display_name,
+    ):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def change_service_config2(self, service_handle, info_level, value):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def control_service(self, service_handle, control):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete_service(self, service_handle):
+        raise NotImplementedError
+
+    def get_service_change_time(self, service_name):
+        """
+        Returns a value that changes whenever the configuration of a service
+        changes, or None if the backend has no such signal.
+        """
+        return None
+
+
+class Pywin32Backend(ScmBackend):
+    """
+    Backend talking to the real Service Control Manager through pywin32.
+    """
+
+    def __init__(self):
+        import win32service
+
+        self._api = win32service
+
+    def open_sc_manager(self, machine_name, database_name, desired_access):
+        return self._api.OpenSCManager(machine_name, database_name, desired_access)
+
+    def open_service(self, scm_handle, service_name, desired_access):
+        return self._api.OpenService(scm_handle, service_name, desired_access)
+
+    def close_service_handle(self, handle):
+        return self._api.CloseServiceHandle(handle)
+
+    def enum_services_status(self, scm_handle, service_type, service_state):
+        return self._api.EnumServicesStatus(scm_handle, service_type, service_state)
+
+    def query_service_config(self, service_handle):
+        return self._api.QueryServiceConfig(service_handle)
+
+    def query_service_config2(self, service_handle, info_level):
+        return self._api.QueryServiceConfig2(service_handle, info_level)
+
+    def query_service_status(self, service_handle):
+        return self._api.QueryServiceStatus(service_handle)
+
+    def enum_dependent_services(self, service_handle, service_state):
+        return self._api.EnumDependentServices(service_handle, service_state)
+
+    def create_service(self, scm_handle, service_name, display_name, desired_access,
+                       service_type, start_type, error_control, binary_path,
+                       load_order_group, fetch_tag, dependencies, username, password):
+        return self._api.CreateService(
+            scm_handle, service_name, display_name, desired_access, service_type,
+            start_type, error_control, binary_path, load_order_group, fetch_tag,
+            dependencies, username, password,
+        )
+
+    def change_service_config(self, service_handle, service_type, start_type,
+                              error_control, binary_path, load_order_group, fetch_tag,
+                              dependencies, username, password, display_name):
+        return self._api.ChangeServiceConfig(
+            service_handle, service_type, start_type, error_control, binary_path,
+            load_order_group, fetch_tag, dependencies, username, password, display_name,
+        )
+
+    def change_service_config2(self, service_handle, info_level, value):
+        return self._api.ChangeServiceConfig2(service_handle, info_level, value)
+
+    def control_service(self, service_handle, control):
+        return self._api.ControlService(service_handle, control)
+
+    def delete_service(self, service_handle):
+        return self._api.DeleteService(service_handle)
+
+    def get_service_change_time(self, service_name):
+        # Last write time of the service registry key, in 100ns intervals
+        import winreg
+
+        try:
+            with winreg.OpenKey(
+                winreg.HKEY_LOCAL_MACHINE, f"{SERVICES_REGISTRY_KEY}\\{service_name}"
+            ) as key:
+                return winreg.QueryInfoKey(key)[2]
+        except OSError:
+            return None
+
+
+class FakeService:
+    """
+    A single service registered in the fake Service Control Manager.
+
+    A service with `stop_polls` stays in `stop_pending` for that many status
+    queries after it was asked to stop, reporting `wait_hint` milliseconds.
+    """
+
+    def __init__(self, name, path, display_name=None, description=None,
+                 start_type=SERVICE_DEMAND_START, state=SERVICE_STOPPED,
+                 logon="LocalSystem", dependencies=None,
+                 service_type=SERVICE_WIN32_OWN_PROCESS, stop_polls=0, wait_hint=0):
+        self.name = name
+        self.path = path
+        self.display_name = display_name or name
+        self.description = description
+        self.start_type = start_type
+        self.state = state
+        self.logon = logon
+        self.dependencies = list(dependencies or [])
+        self.service_type = service_type
+        self.stop_polls = stop_polls
+        self.wait_hint = wait_hint
+        self.change_time = 0
+        self._pending_polls = 0
+
+    def config(self):
+        """Returns the tuple QueryServiceConfig yields for this service."""
+        return (
+            self.service_type,
+            self.start_type,
+            SERVICE_ERROR_NORMAL,
+            self.path,
+            "",
+            0,
+            list(self.dependencies),
+            self.logon,
+            self.display_name,
+        )
+
+    def status(self):
+        """Returns the tuple QueryServiceStatus yields for this service."""
+        accepted = 1 if self.state == SERVICE_RUNNING else 0
+        pending = self.state == SERVICE_STOP_PENDING
+        return (
+            self.service_type,
+            self.state,
+            accepted,
+            0,
+            0,
+            self.stop_polls - self._pending_polls if pending else 0,
+            self.wait_hint if pending else 0,
+        )
+
+    def stop(self):
+        """Moves the service towards stopped, as ControlService(STOP) does."""
+        if self.stop_polls:
+            self.state = SERVICE_STOP_PENDING
+            self._pending_polls = self.stop_polls
+        else:
+            self.state = SERVICE_STOPPED
+
+    def poll(self):
+        """Advances a pending stop by one status query."""
+        if self.state == SERVICE_STOP_PENDING:
+            self._pending_polls -= 1
+            if self._pending_polls <= 0:
+                self.state = SERVICE_STOPPED
+
+
+class FakeHandle:
+    """
+    Opaque handle returned by the fake Service Control Manager.
+    """
+
+    def __init__(self, kind, access, service_name=None, machine_name=None):
+        self.kind = kind
+        self.access = access
+        self.service_name = service_name
+        self.machine_name = machine_name
+        self.closed = False
+
+    def __repr__(self):
+        return f"<FakeHandle {self.kind} {self.service_name or ''} access=0x{self.access:X}>"
+
+
+class FakeBackend(ScmBackend):
+    """
+    Deterministic in-memory Service Control Manager.
+
+    Every call is counted in `calls` under its pywin32 function name, optionally
+    delayed by `latency` seconds, and can be made to fail with a chosen Win32
+    error code through `inject_error`.
+
+    The local machine is always reachable. Remote machines have to be
+    registered with `add_host`, which can give them extra latency or make
+    them unreachable; every remote machine sees the same services.
+
+    Args:
+        service_count (int): Number of generated services to register.
+        latency (float): Seconds to sleep on every SCM call.
+    """
+
+    def __init__(self, service_count=0, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.services = {}
+        self.open_handles = set()
+        self._errors = []
+        self.hosts = {}
+        # Randomly seeded, so a cache written by another fake backend is stale
+        self._change_clock = int.from_bytes(os.urandom(6), "little")
+        self._lock = threading.Lock()
+
+        for index in range(service_count):
+            start_type = (SERVICE_AUTO_START, SERVICE_DEMAND_START, SERVICE_DISABLED)[index % 3]
+            self.add_service(
+                FakeService(
+                    name=f"FakeService{index:05d}",
+                    path=f"C:\\Fake\\service{index:05d}.exe",
+                    display_name=f"Fake Service {index}",
+                    description=f"Simulated service number {index}.",
+                    start_type=start_type,
+                    state=SERVICE_RUNNING if start_type == SERVICE_AUTO_START else SERVICE_STOPPED,
+                )
+            )
+
+    def add_service(self, service):
+        """Registers a service, replacing any existing one with the same name."""
+        self._touch(service)
+        self.services[service.name] = service
+        return service
+
+    def update_service(self, service_name, **attributes):
+        """Changes attributes of a service as if its configuration was edited."""
+        service = self.services[service_name]
+        for attribute, value in attributes.items():
+            setattr(service, attribute, value)
+        self._touch(service)
+
+    def add_host(self, machine_name, latency=0.0, error=None):
+        """
+        Registers a remote machine.
+
+        Args:
+            machine_name (str): Name passed to OpenSCManager.
+            latency (float): Extra seconds every call on the machine takes.
+            error (int): Win32 error code OpenSCManager fails with, e.g. 1722
+                for an unreachable machine.
+        """
+        self.hosts[machine_name] = {"latency": latency, "error": error}
+
+    def _host_delay(self, machine_name):
+        if machine_name is not None:
+            latency = self.hosts.get(machine_name, {}).get("latency")
+            if latency:
+                time.sleep(latency)
+
+    def _touch(self, service):
+        self._change_clock += 1
+        service.change_time = self._change_clock
+
+    def inject_error(self, call, winerror, service_name=None, times=None):
+        """
+        Makes a call fail with the given Win32 error code.
+
+        Args:
+            call (str): pywin32 function name, e.g. "OpenService".
+            winerror (int): Error code to raise, e.g. 5, 1062 or 1073.
+            service_name (str): Only fail for this service. Fails for all when None.
+            times (int): Number of failures before the call succeeds again. Unlimited when None.
+        """
+        self._errors.append({"call": call, "code": winerror, "name": service_name, "times": times})
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def _enter(self, call, service_name=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls[call] += 1
+            for rule in self._errors:
+                if rule["call"] != call or rule["times"] == 0:
+                    continue
+                if rule["name"] is not None and rule["name"] != service_name:
+                    continue
+                if rule["times"] is not None:
+                    rule["times"] -= 1
+                raise self._error(rule["code"], call)
+
+    @staticmethod
+    def _error(code, call):
+        return make_error(code, call)
+
+    def _check(self, handle, kind, access, call):
+        if not isinstance(handle, FakeHandle) or handle.closed or handle.kind != kind:
+            raise self._error(ERROR_INVALID_HANDLE, call)
+        self._host_delay(handle.machine_name)
+        if handle.access & access != access:
+            raise self._error(ERROR_ACCESS_DENIED, call)
+
+    def _service(self, handle, call):
+        service = self.services.get(handle.service_name)
+        if service is None:
+            raise self._error(ERROR_SERVICE_DOES_NOT_EXIST, call)
+        return service
+
+    def _open(self, kind, access, service_name=None, machine_name=None):
+        handle = FakeHandle(kind, access, service_name, machine_name)
+        with self._lock:
+            self.open_handles.add(handle)
+        return handle
+
+    def open_sc_manager(self, machine_name, database_name, desired_access):
+        self._enter("OpenSCManager")
+        if machine_name is not None:
+            host = self.hosts.get(machine_name)
+            if host is None:
+                raise self._error(RPC_S_SERVER_UNAVAILABLE, "OpenSCManager")
+            self._host_delay(machine_name)
+            if host["error"] is not None:
+                raise self._error(host["error"], "OpenSCManager")
+        return self._open("scm", desired_access, machine_name=machine_name)
+
+    def open_service(self, scm_handle, service_name, desired_access):
+        self._enter("OpenService", service_name)
+        self._check(scm_handle, "scm", SC_MANAGER_CONNECT, "OpenService")
+        if service_name not in self.services:
+            raise self._error(ERROR_SERVICE_DOES_NOT_EXIST, "OpenService")
+        return self._open("service", desired_access, service_name, scm_handle.machine_name)
+
+    def close_service_handle(self, handle):
+        self._enter("CloseServiceHandle", getattr(handle, "service_name", None))
+        if not isinstance(handle, FakeHandle) or handle.closed:
+            raise self._error(ERROR_INVALID_HANDLE, "CloseServiceHandle")
+        handle.closed = True
+        with self._lock:
+            self.open_handles.discard(handle)
+
+    def enum_services_status(self, scm_handle, service_type, service_state):
+        self._enter("EnumServicesStatus")
+        self._check(scm_handle, "scm", SC_MANAGER_ENUMERATE_SERVICE, "EnumServicesStatus")
+        result = []
+        for service in list(self.services.values()):
+            if not service.service_type & service_type:
+                continue
+            active = service.state != SERVICE_STOPPED
+            if not service_state & (SERVICE_ACTIVE if active else SERVICE_INACTIVE):
+                continue
+            result.append((service.name, service.display_name, service.status()))
+        return tuple(result)
+
+    def query_service_config(self, service_handle):
+        self._enter("QueryServiceConfig", getattr(service_handle, "service_name", None))
+        self._check(service_handle, "service", SERVICE_QUERY_CONFIG, "QueryServiceConfig")
+        return self._service(service_handle, "QueryServiceConfig").config()
+
+    def query_service_config2(self, service_handle, info_level):
+        self._enter("QueryServiceConfig2", getattr(service_handle, "service_name", None))
+        self._check(service_handle, "service", SERVICE_QUERY_CONFIG, "QueryServiceConfig2")
+        service = self._service(service_handle, "QueryServiceConfig2")
+        if info_level == SERVICE_CONFIG_DESCRIPTION:
+            return service.description
+        return None
+
+    def query_service_status(self, service_handle):
+        self._enter("QueryServiceStatus", getattr(service_handle, "service_name", None))
+        self._check(service_handle, "service", SERVICE_QUERY_STATUS, "QueryServiceStatus")
+        service = self._service(service_handle, "QueryServiceStatus")
+        with self._lock:
+            service.poll()
+            return service.status()
+
+    def enum_dependent_services(self, service_handle, service_state):
+        self._enter("EnumDependentServices", getattr(service_handle, "service_name", None))
+        self._check(
+            service_handle, "service", SERVICE_ENUMERATE_DEPENDENTS, "EnumDependentServices"
+        )
+        self._service(service_handle, "EnumDependentServices")
+        with self._lock:
+            # Like the SCM, return dependents of dependents before the services they depend on
+            ordered, seen = [], set()
+
+            def visit(name):
+                for service in self.services.values():
+                    depends = {dependency.lower() for dependency in service.dependencies}
+                    if name.lower() in depends and service.name not in seen:
+                        seen.add(service.name)
+                        visit(service.name)
+                        ordered.append(service)
+
+            visit(service_handle.service_name)
+            if service_state == SERVICE_ACTIVE:
+                ordered = [service for service in ordered if service.state != SERVICE_STOPPED]
+            elif service_state == SERVICE_INACTIVE:
+                ordered = [service for service in ordered if service.state == SERVICE_STOPPED]
+            return [(service.name, service.display_name, service.status()) for service in ordered]
+
+    def create_service(self, scm_handle, service_name, display_name, desired_access,
+                       service_type, start_type, error_control, binary_path,
+                       load_order_group, fetch_tag, dependencies, username, password):
+        self._enter("CreateService", service_name)
+        self._check(scm_handle, "scm", SC_MANAGER_CREATE_SERVICE, "CreateService")
+        with self._lock:
+            if service_name in self.services:
+                raise self._error(ERROR_SERVICE_EXISTS, "CreateService")
+            self.services[service_name] = FakeService(
+                name=service_name,
+                path=binary_path,
+                display_name=display_name,
+                start_type=start_type,
+                logon=username or "LocalSystem",
+                dependencies=dependencies,
+                service_type=service_type,
+            )
+            self._touch(self.services[service_name])
+        return self._open("service", desired_access, service_name, scm_handle.machine_name)
+
+    def change_service_config(self, service_handle, service_type, start_type,
+                              error_control, binary_path, load_order_group, fetch_tag,
+                              dependencies, username, password, display_name):
+        self._enter("ChangeServiceConfig", getattr(service_handle, "service_name", None))
+        self._check(service_handle, "service", SERVICE_CHANGE_CONFIG, "ChangeServiceConfig")
+        service = self._service(service_handle, "ChangeServiceConfig")
+        with self._lock:
+            if service_type != SERVICE_NO_CHANGE:
+                service.service_type = service_type
+            if start_type != SERVICE_NO_CHANGE:
+                service.start_type = start_type
+            if binary_path is not None:
+                service.path = binary_path
+            if dependencies is not None:
+                service.dependencies = list(dependencies)
+            if username is not None:
+                service.logon = username
+            if display_name is not None:
+                service.display_name = display_name
+            self._touch(service)
+
+    def change_service_config2(self, service_handle, info_level, value):
+        self._enter("ChangeServiceConfig2", getattr(service_handle, "service_name", None))
+        self._check(service_handle, "service", SERVICE_CHANGE_CONFIG, "ChangeServiceConfig2")
+        service = self._service(service_handle, "ChangeServiceConfig2")
+        with self._lock:
+            if info_level == SERVICE_CONFIG_DESCRIPTION:
+                service.description = value
+            self._touch(service)
+
+    def control_service(self, service_handle, control):
+        self._enter("ControlService", getattr(service_handle, "service_name", None))
+        if control == SERVICE_CONTROL_STOP:
+            self._check(service_handle, "service", SERVICE_STOP, "ControlService")
+        service = self._service(service_handle, "ControlService")
+        with self._lock:
+            if control == SERVICE_CONTROL_STOP:
+                if service.state == SERVICE_STOPPED:
+                    raise self._error(ERROR_SERVICE_NOT_ACTIVE, "ControlService")
+                if service.state == SERVICE_STOP_PENDING:
+                    raise self._error(ERROR_SERVICE_CANNOT_ACCEPT_CTRL, "ControlService")
+                if any(
+                    other.state != SERVICE_STOPPED
+                    and service.name.lower() in {d.lower() for d in other.dependencies}
+                    for other in self.services.values()
+                ):
+                    raise self._error(ERROR_DEPENDENT_SERVICES_RUNNING, "ControlService")
+                service.stop()
+            return service.status()
+
+    def delete_service(self, service_handle):
+        self._enter("DeleteService", getattr(service_handle, "service_name", None))
+        self._check(service_handle, "service", DELETE, "DeleteService")
+        self._service(service_handle, "DeleteService")
+        with self._lock:
+            del self.services[service_handle.service_name]
+
+    def get_service_change_time(self, service_name):
+        self._enter("RegQueryInfoKey", service_name)
+        service = self.services.get(service_name)
+        return service.change_time if service else None
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Returns the process-wide backend, creating the pywin32 backend on first use.
+
+    Other backends, like the fake, are only installed explicitly through
+    `set_backend`.
+    """
+    global _backend
+    if _backend is None:
+        _backend = Pywin32Backend()
+    return _backend
+
+
+def set_backend(backend):
+    """Replaces the process-wide backend and returns the previous one."""
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
@@ -0,0 +1,230 @@
+import contextlib
+import io
+import json
+import sys
+
+from caps import (
+    delete_service,
+    export_delta,
+    export_machines,
+    export_services,
+    get_service,
+    set_service,
+)
+from service_helpers import log_message, get_service_schema
+from localization import _
+from projection import parse_properties
+from validation import compile_schema
+
+JSONRPC_VERSION = "2.0"
+
+# Error codes defined by the JSON-RPC 2.0 specification
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# Types of the request params, checked before a method runs. `input` is
+# validated by the command itself, like `--input`.
+PARAMS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "whatIf": {"type": ["boolean", "null"]},
+        "jobs": {"type": ["integer", "null"]},
+        "filter": {"type": ["object", "null"]},
+        "properties": {"type": ["array", "string", "null"], "items": {"type": "string"}},
+        "machines": {"type": ["array", "null"], "items": {"type": "string"}},
+        "since": {"type": ["string", "null"]},
+        "updateSnapshot": {"type": ["boolean", "null"]},
+        "saveSnapshot": {"type": ["string", "null"]},
+        "fromSnapshot": {"type": ["string", "null"]},
+    },
+}
+
+
+class Server:
+    """
+    Long-lived request loop speaking newline-delimited JSON-RPC 2.0.
+
+    Every request line carries a `method` (get, set, delete, export, schema or
+    shutdown) and optional `params`:
+
+        {"jsonrpc": "2.0", "id": 1, "method": "get", "params": {"input": {"name": "W32Time"}}}
+
+    `params.input` is the same JSON document the `config` commands accept on
+    `--input`, `params.whatIf` maps to `--what-if`, `params.jobs` to `--jobs`,
+    `params.filter` to `--filter`, `params.properties` to `--properties`,
+    `params.machines` (an array) to `--machines`, `params.since` to `--since`,
+    `params.updateSnapshot` to `--update-snapshot`, `params.saveSnapshot` to
+    `--save-snapshot` and `params.fromSnapshot` to `--from-snapshot`.
+    Params of the wrong type are rejected with an invalid params error.
+    The result is the JSON the command would print. A non-zero exit code of the
+    command is returned as an error whose code is the exit code and whose data
+    holds any output.
+    """
+
+    def __init__(self, input_stream=None, output_stream=None):
+        self.input_stream = input_stream or sys.stdin
+        self.output_stream = output_stream or sys.stdout
+        # Warm state reused by every request
+        self.schema = json.loads(get_service_schema())
+        self.validate_params = compile_schema(PARAMS_SCHEMA)
+        self.methods = {
+            "get": self._get,
+            "set": self._set,
+            "delete": self._delete,
+            "export": self._export,
+            "schema": self._schema,
+        }
+        self.running = False
+
+    def serve_forever(self):
+        """
+        Processes requests until end of input or a `shutdown` request.
+        """
+        log_message("INFO", "serverStarted", "server")
+        self.running = True
+        for line in self.input_stream:
+            if not line.strip():
+                continue
+            response = self.handle_line(line)
+            if response is not None:
+                self.output_stream.write(json.dumps(response) + "\n")
+                self.output_stream.flush()
+            if not self.running:
+                break
+        log_message("INFO", "serverStopped", "server")
+
+    def handle_line(self, line):
+        """
+        Handles a single request line.
+
+        Returns:
+            dict or None: The response, or None for notifications (requests without an id).
+        """
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            return _error_response(None, PARSE_ERROR, _("serverParseError"))
+
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error_response(None, INVALID_REQUEST, _("serverInvalidRequest"))
+
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params") or {}
+        log_message("DEBUG", "serverRequest", "server", method, request_id)
+        errors = self.validate_params(params, "params") if isinstance(params, dict) else None
+
+        if method == "shutdown":
+            self.running = False
+            response = {"jsonrpc": JSONRPC_VERSION, "id": request_id, "result": None}
+        elif method not in self.methods:
+            response = _error_response(request_id, METHOD_NOT_FOUND, _("serverMethodNotFound", method))
+        elif not isinstance(params, dict):
+            response = _error_response(request_id, INVALID_PARAMS, _("serverInvalidParams", method))
+        elif errors:
+            response = _error_response(
+                request_id,
+                INVALID_PARAMS,
+                _("serverInvalidParamTypes", method),
+                [_(message, *args) for message, *args in errors],
+            )
+        else:
+            try:
+                response = self.methods[method](request_id, params)
+            except Exception as e:
+                log_message("ERROR", "serverInternalError", "server", method, str(e))
+                response = _error_response(request_id, INTERNAL_ERROR, str(e))
+
+        return response if "id" in request else None
+
+    def _get(self, request_id, params):
+        return _invoke(request_id, get_service, _input(params), snapshot_path=params.get("fromSnapshot"))
+
+    def _set(self, request_id, params):
+        return _invoke(
+            request_id,
+            set_service,
+            _input(params),
+            what_if=bool(params.get("whatIf")),
+            jobs=params.get("jobs") or 1,
+        )
+
+    def _delete(self, request_id, params):
+        return _invoke(
+            request_id,
+            delete_service,
+            _input(params),
+            what_if=bool(params.get("whatIf")),
+            jobs=params.get("jobs") or 1,
+        )
+
+    def _export(self, request_id, params):
+        def export():
+            service_filter = None
+            if params.get("filter") is not None:
+                from service_filter import parse_filter
+
+                service_filter = parse_filter(json.dumps(params["filter"]))
+            export_args = {
+                "jobs": params.get("jobs") or 1,
+                "service_filter": service_filter,
+                "properties": parse_properties(params.get("properties")),
+            }
+            if params.get("since"):
+                return export_delta(
+                    params["since"], update_snapshot=bool(params.get("updateSnapshot")), **export_args
+                )
+            if params.get("machines"):
+                return export_machines(params["machines"], **export_args)
+            return export_services(snapshot_path=params.get("saveSnapshot"), **export_args)
+
+        return _invoke(request_id, export)
+
+    def _schema(self, request_id, params):
+        return {"jsonrpc": JSONRPC_VERSION, "id": request_id, "result": self.schema}
+
+
+def _input(params):
+    return json.dumps(params.get("input", {}))
+
+
+def _invoke(request_id, function, *args, **kwargs):
+    """
+    Runs a command function, capturing what it prints and the code it exits with.
+    """
+    buffer = io.StringIO()
+    code = 0
+    returned = None
+    with contextlib.redirect_stdout(buffer):
+        try:
+            returned = function(*args, **kwargs)
+        except SystemExit as e:
+            code = e.code or 0
+
+    output = returned if isinstance(returned, str) else buffer.getvalue()
+    output = output.strip()
+    try:
+        output = json.loads(output) if output else None
+    except json.JSONDecodeError:
+        pass
+
+    if code:
+        return _error_response(request_id, code, _("serverCommandFailed", code), output)
+    return {"jsonrpc": JSONRPC_VERSION, "id": request_id, "result": output}
+
+
+def _error_response(request_id, code, message, data=None):
+    error = {"code": code, "message": message}
+    if data is not None:
+        error["data"] = data
+    return {"jsonrpc": JSONRPC_VERSION, "id": request_id, "error": error}
+
+
+def serve(input_stream=None, output_stream=None):
+    """
+    Runs the JSON-RPC server on the given streams (stdin/stdout by default).
+    """
+    Server(input_stream, output_stream).serve_forever()
@@ -0,0 +1,100 @@
+import time
+
+import handles
+import scm_backend
+from scheduler import run_waves
+from service_helpers import log_message
+
+# Overall time a stop may take, including the stop of running dependents
+DEFAULT_STOP_TIMEOUT = 30.0
+# Bounds of the interval between two status polls, in seconds
+MIN_POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 10.0
+
+# Errors of a stop request that mean "not yet": the service is still
+# transitioning, or running dependents have not stopped yet
+_RETRY_STOP_ERRORS = (
+    scm_backend.ERROR_DEPENDENT_SERVICES_RUNNING,
+    scm_backend.ERROR_SERVICE_CANNOT_ACCEPT_CTRL,
+)
+
+
+def stop_service(manager, service_name, service, timeout=DEFAULT_STOP_TIMEOUT, jobs=1):
+    """
+    Stops a service and its running dependents, and waits until it has stopped.
+
+    The running dependents (`EnumDependentServices`) are stopped first, over
+    up to `jobs` worker threads. Every service is then polled with `QueryServiceStatus`, starting at
+    a tenth of its wait hint and backing off exponentially, until it reports
+    stopped or the overall timeout has passed.
+
+    Args:
+        manager (HandleManager): Handle manager of the backend to use.
+        service_name (str): Name of the service.
+        service: Handle of the service opened with at least `SERVICE_ACCESS_STOP`.
+        timeout (float): Seconds to wait for the service and its dependents.
+        jobs (int): Number of worker threads stopping dependents. 1 stops
+            them one after the other.
+
+    Returns:
+        bool: True if the service was running, False if it was already stopped.
+
+    Raises:
+        scm_backend.error: If a stop fails, or with ERROR_SERVICE_REQUEST_TIMEOUT
+            if the services did not stop in time.
+    """
+    deadline = time.monotonic() + timeout
+    dependents = [
+        entry[0]
+        for entry in manager.backend.enum_dependent_services(service, scm_backend.SERVICE_ACTIVE)
+    ]
+    if dependents:
+        log_message("DEBUG", "serviceStopDependents", "service", service_name, ", ".join(dependents))
+        run_waves(
+            [dependents],
+            lambda dependent: _stop_dependent(manager, dependent, deadline),
+            min(len(dependents), jobs),
+        )
+    return _stop_and_wait(manager, service_name, service, deadline)
+
+
+def _stop_dependent(manager, service_name, deadline):
+    with manager.service(service_name, handles.SERVICE_ACCESS_STOP) as service:
+        return _stop_and_wait(manager, service_name, service, deadline)
+
+
+def _stop_and_wait(manager, service_name, service, deadline):
+    backend = manager.backend
+    stop_sent = False
+    interval = None
+    while True:
+        if not stop_sent:
+            try:
+                status = backend.control_service(service, scm_backend.SERVICE_CONTROL_STOP)
+                stop_sent = True
+            except scm_backend.error as e:
+                if e.winerror == scm_backend.ERROR_SERVICE_NOT_ACTIVE:
+                    return interval is not None
+                if e.winerror not in _RETRY_STOP_ERRORS:
+                    raise
+                status = backend.query_service_status(service)
+        else:
+            status = backend.query_service_status(service)
+
+        if status[1] == scm_backend.SERVICE_STOPPED:
+            return True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise scm_backend.make_error(
+                scm_backend.ERROR_SERVICE_REQUEST_TIMEOUT, "QueryServiceStatus"
+            )
+
+        # Start at a tenth of the wait hint (milliseconds), then back off
+        if interval is None:
+            interval = status[6] / 10000.0
+        else:
+            interval *= 2
+        interval = min(max(interval, MIN_POLL_INTERVAL), MAX_POLL_INTERVAL)
+        log_message("TRACE", "serviceStopWaiting", "service", service_name, interval)
+        time.sleep(min(interval, remaining))
@@ -0,0 +1,95 @@
+import fnmatch
+import json
+import re
+from sys import exit
+
+from service_helpers import log_message, validate_json_input
+
+# Properties known from the enumeration, checked before a service is opened
+ENUMERATION_PROPERTIES = ("name", "displayName", "state")
+# Properties that need the service configuration, checked before the description is fetched
+CONFIG_PROPERTIES = ("startupType", "logon")
+
+
+class ServiceFilter:
+    """
+    Selects the services an export returns.
+
+    `name` and `displayName` take a glob pattern (`"Win*"`) or an object with
+    a regular expression (`{"regex": "^W32"}`); `state`, `startupType` and
+    `logon` take a value or a list of accepted values. All comparisons ignore
+    case, like the SCM does for service names. A service has to match every
+    given property.
+
+    Args:
+        criteria (dict): Property names mapped to patterns or accepted values.
+    """
+
+    def __init__(self, criteria):
+        self.criteria = criteria
+        self._enumeration_checks = []
+        self._config_checks = []
+        for key, value in criteria.items():
+            if key in ("name", "displayName"):
+                check = _compile_pattern(value)
+            elif key in ENUMERATION_PROPERTIES or key in CONFIG_PROPERTIES:
+                check = _compile_values(value)
+            else:
+                raise ValueError(key)
+            checks = self._enumeration_checks if key in ENUMERATION_PROPERTIES else self._config_checks
+            checks.append((key, check))
+
+    @property
+    def needs_config(self):
+        """
+        True if the filter checks properties that come from the service configuration.
+        """
+        return bool(self._config_checks)
+
+    def matches_enumeration(self, service_info):
+        """
+        Checks the properties known from the enumeration.
+        """
+        return all(check(service_info[key]) for key, check in self._enumeration_checks)
+
+    def matches_config(self, service_info):
+        """
+        Checks the properties read from the service configuration.
+        """
+        return all(check(service_info[key]) for key, check in self._config_checks)
+
+
+def _compile_pattern(pattern):
+    if isinstance(pattern, dict) and isinstance(pattern.get("regex"), str):
+        # Regular expressions match anywhere unless they are anchored
+        regex = re.compile(pattern["regex"], re.IGNORECASE)
+        return lambda value: value is not None and regex.search(value) is not None
+    if isinstance(pattern, str):
+        # Globs match the whole value
+        regex = re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+        return lambda value: value is not None and regex.match(value) is not None
+    raise ValueError(pattern)
+
+
+def _compile_values(values):
+    if isinstance(values, str):
+        values = [values]
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise ValueError(values)
+    accepted = {value.lower() for value in values}
+    return lambda value: value is not None and value.lower() in accepted
+
+
+def parse_filter(inputs):
+    """
+    Parses the JSON filter passed to `config export --filter`.
+
+    Returns:
+        ServiceFilter: The compiled filter. Exits with code 4 if the filter is invalid.
+    """
+    criteria = validate_json_input(inputs)
+    try:
+        return ServiceFilter(criteria)
+    except (ValueError, re.error) as e:
+        log_message("ERROR", "exportFilterInvalid", "input validation", json.dumps(criteria), str(e))
+        exit(4)
@@ -1,48 +1,106 @@
 import json
-import win32service
-import datetime 
-import inspect
+import datetime
+import os
 import sys
 from sys import exit
 from localization import _
 
-def validate_json_input(inputs, *required_properties):
+import scm_backend
+from schema import SERVICE_SCHEMA_JSON
+from validation import compile_schema
+
+# Numeric severity of the log levels, lowest first
+LOG_LEVELS = {"TRACE": 0, "DEBUG": 1, "INFO": 2, "WARN": 3, "ERROR": 4}
+LOG_LEVEL_ALIASES = {"WARNING": "WARN"}
+DEFAULT_LOG_LEVEL = "WARN"
+
+_min_log_level = None
+
+# Start type codes and service states as they appear in the resource
+START_TYPE_NAMES = {
+    scm_backend.SERVICE_AUTO_START: "Automatic",
+    scm_backend.SERVICE_DEMAND_START: "Manual",
+    scm_backend.SERVICE_DISABLED: "Disabled",
+}
+START_TYPE_CODES = {name: code for code, name in START_TYPE_NAMES.items()}
+SERVICE_STATE_NAMES = {
+    1: "stopped",
+    2: "start_pending",
+    3: "stop_pending",
+    4: "running",
+    5: "continue_pending",
+    6: "pause_pending",
+    7: "paused",
+}
+
+def validate_json_input(inputs, *required_properties, allow_array=False, schema=None):
     """
-    Validates that the input string is valid JSON and optionally checks for required properties.
+    Parses the input JSON and validates it against a schema.
+
+    When `allow_array` is set, the input may also be an array. Plain strings in the
+    array are treated as service names, and every item is validated.
+
+    All errors of the input are logged before exiting: with code 1 if only
+    required properties are missing, otherwise with code 4.
+
+    Args:
+        inputs (str): JSON input.
+        *required_properties (str): Properties every object must have, in
+            addition to those the schema requires.
+        allow_array (bool): If True, also accepts an array of objects.
+        schema (dict): JSON schema the objects must match. Only the required
+            properties are checked when None.
+
+    Returns:
+        dict or list: The parsed input object, or a list of objects for array input.
     """
     try:
         input_data = json.loads(inputs)
-        log_message("DEBUG", _("jsonParseSuccess", input_data), "input validation")
+        log_message("DEBUG", "jsonParseSuccess", "input validation", input_data)
     except json.JSONDecodeError:
-        log_message("ERROR", _("jsonParseError"), "input validation")
-        exit(4)
-
-    if not isinstance(input_data, dict):
-        log_message("ERROR", _("jsonNotObject"), "input validation")
+        log_message("ERROR", "jsonParseError", "input validation")
         exit(4)
 
-    flat_required = []
-    for prop in required_properties:
-        if isinstance(prop, (list, tuple)):
-            flat_required.extend([p for p in prop if isinstance(p, str)])
-        elif isinstance(prop, str):
-            flat_required.append(prop)
-    
-    log_message(
-        "DEBUG", _("jsonCheckProperties", flat_required), "input validation"
-    )
-    
-    missing_properties = [prop for prop in flat_required if prop not in input_data]
-    if missing_properties:
-        log_message(
-            "ERROR", 
-            _("jsonMissingProps", ", ".join(missing_properties)), 
-            "input validation"
-        )
-        exit(1)
+    validate = get_validator(schema, required_properties)
+    errors = []
+    if allow_array and isinstance(input_data, list):
+        input_data = [{"name": item} if isinstance(item, str) else item for item in input_data]
+        for index, item in enumerate(input_data):
+            validate(item, "$", index, errors)
+    else:
+        validate(input_data, errors=errors)
 
+    if errors:
+        for message, *args in errors:
+            log_message("ERROR", message, "input validation", *args)
+        exit(1 if all(error[0] == "schemaRequired" for error in errors) else 4)
     return input_data
 
+# Compiled validators by schema and required properties
+_validators = {}
+
+def get_validator(schema=None, required_properties=()):
+    """
+    Returns the compiled validator of a schema, compiling it on first use.
+
+    Args:
+        schema (dict): JSON schema of an input object, or None for any object.
+        required_properties (tuple): Properties required in addition to the
+            schema's own.
+
+    Returns:
+        callable: Validator as returned by `validation.compile_schema`.
+    """
+    key = (id(schema), tuple(required_properties))
+    validator = _validators.get(key)
+    if validator is None:
+        schema = schema or {"type": "object"}
+        required = list(dict.fromkeys([*schema.get("required", ()), *required_properties]))
+        log_message("DEBUG", "jsonCheckProperties", "input validation", required)
+        validator = compile_schema(dict(schema, required=required))
+        _validators[key] = validator
+    return validator
+
 def get_start_type_description(start_type):
     """
     Converts between start type code and description. If an integer is provided, returns the name.
@@ -54,82 +112,82 @@ def get_start_type_description(start_type):
     Returns:
         str or int: The description of the start type or the integer value.
     """
-    start_type_mapping = {
-        2: "Automatic",
-        3: "Manual",
-        4: "Disabled",
-    }
-
     # Handle None or Unknown values
     if start_type is None or start_type == "Unknown":
         return (
-            win32service.SERVICE_NO_CHANGE
+            scm_backend.SERVICE_NO_CHANGE
             if isinstance(start_type, str)
             else "Disabled"
         )
 
     if isinstance(start_type, int):
-        return start_type_mapping.get(start_type, "Disabled")
+        return START_TYPE_NAMES.get(start_type, "Disabled")
     elif isinstance(start_type, str):
-        reverse_mapping = {v: k for k, v in start_type_mapping.items()}
-        return reverse_mapping.get(start_type, win32service.SERVICE_NO_CHANGE)
+        return START_TYPE_CODES.get(start_type, scm_backend.SERVICE_NO_CHANGE)
     else:
         return "Invalid input"
 
-def get_service_status(scm, service_name):
-    service = win32service.OpenService(
-        scm, service_name, win32service.SERVICE_QUERY_STATUS
-    )
-    try:
-        service_status = get_service_state_description(
-            win32service.QueryServiceStatus(service)[1]
-        )
-        win32service.CloseServiceHandle(service)
-        return service_status
-    except Exception as e:
-        return json.dumps({"error": str(e)}, indent=4)
-    
 def get_service_state_description(state_code):
-    state_mapping = {
-        1: "stopped",
-        2: "start_pending",
-        3: "stop_pending",
-        4: "running",
-        5: "continue_pending",
-        6: "pause_pending",
-        7: "paused",
-    }
-    return state_mapping.get(state_code, "unknown")
+    return SERVICE_STATE_NAMES.get(state_code, "unknown")
 
 def validate_credentials(username, password):
     if (username and not password) or (password and not username):
         exit(2)
     return username or None, password or None
 
-def log_message(level, message, target):
+def get_log_level():
+    """
+    Returns the numeric minimum level a message needs to be emitted.
+
+    The level is read once from the DSC_TRACE_LEVEL environment variable that
+    DSC passes to resources (error, warn, info, debug or trace) and defaults to
+    warn like DSC itself.
+    """
+    global _min_log_level
+    if _min_log_level is None:
+        set_log_level(os.environ.get("DSC_TRACE_LEVEL", DEFAULT_LOG_LEVEL))
+    return _min_log_level
+
+def set_log_level(level):
+    """
+    Sets the minimum level of emitted messages. Unknown levels fall back to the default.
+    """
+    global _min_log_level
+    level = str(level).upper()
+    level = LOG_LEVEL_ALIASES.get(level, level)
+    _min_log_level = LOG_LEVELS.get(level, LOG_LEVELS[DEFAULT_LOG_LEVEL])
+
+def log_message(level, message, target, *args):
     """
     Logs a message in JSON format.
 
+    Messages below the configured level return before any formatting work. The
+    message is translated and formatted with `args` only when it is emitted;
+    callable arguments are called at that point too, so expensive values can be
+    passed as a lambda.
+
     Args:
         level (str): The log level (e.g., "DEBUG", "INFO", "ERROR").
-        message (str): The log message.
+        message (str): The message ID or log message.
         target (str): The target or context of the log.
-
-    Returns:
-        str: JSON string representing the log message.
+        *args: Format arguments for the message.
     """
     # Validate log level
-    valid_levels = ["INFO", "DEBUG", "WARN", "ERROR", "TRACE"]
-    if level not in valid_levels:
+    level = LOG_LEVEL_ALIASES.get(level, level)
+    if level not in LOG_LEVELS:
         level = "INFO"  # Default to INFO if invalid level provided
-        
+
+    if LOG_LEVELS[level] < get_log_level():
+        return
+
+    args = [arg() if callable(arg) else arg for arg in args]
     timestamp = datetime.datetime.now().isoformat() + "Z"
-    caller_frame = inspect.currentframe().f_back
+    caller_frame = sys._getframe(1)
     line_number = caller_frame.f_lineno if caller_frame else "Unknown"
     log_entry = {
         "timestamp": timestamp,
         "level": level,
-        "fields": {"message": message},
+        "fields": {"message": _(message, *args)},
         "target": target,
         "line_number": line_number,
     }
@@ -142,55 +200,9 @@ def get_service_schema():
     Returns:
         str: JSON schema as a string.
     """
-    schema = {
-        "$schema": "http://json-schema.org/draft-07/schema#",
-        "title": "win32service",
-        "type": "object",
-        "required": ["name"],
-        "properties": {
-            "_exist": {
-                "description": "Indicates whether the service already exists.",
-                "type": ["boolean", "null"],
-            },
-            "name": {
-                "description": "The name of the Windows service.",
-                "type": "string",
-            },
-            "path": {
-                "description": "The executable path of the Windows service.",
-                "type": "string",
-            },
-            "startupType": {
-                "description": "The startup type of the Windows service.",
-                "type": "string",
-                "enum": ["Automatic", "Manual", "Disabled"],
-            },
-            "displayName": {
-                "description": "The display name of the Windows service.",
-                "type": ["string", "null"],
-            },
-            "description": {
-                "description": "The description of the Windows service.",
-                "type": ["string", "null"],
-            },
-            "dependencies": {
-                "description": "The dependencies of the Windows service.",
-                "type": ["array", "null"],
-            },
-            "username": {
-                "description": "The username for the Windows service logon.",
-                "type": ["string", "null"],
-            },
-            "password": {
-                "description": "The password for the Windows service logon.",
-                "type": ["string", "null"],
-            },
-        },
-        "additionalProperties": False,
-    }
-    return json.dumps(schema, separators=(",", ":"))
+    return SERVICE_SCHEMA_JSON
 
-def record_changes(current_service_info, desired_values, properties_to_check):
+def record_changes(current_service_info, desired_values, properties_to_check, ignore_unset=True):
     """
     Compares current service properties with desired values and records differences.
 
@@ -198,6 +210,8 @@ def record_changes(current_service_info, desired_values, properties_to_check):
         current_service_info (dict): Current properties of the service.
         desired_values (dict): Desired properties of the service.
         properties_to_check (list): List of properties to compare.
+        ignore_unset (bool): If True, desired values of None mean "leave as is"
+            and are not compared.
 
     Returns:
         dict: A dictionary of changes with keys as property names and values as dictionaries
@@ -214,7 +228,7 @@ def record_changes(current_service_info, desired_values, properties_to_check):
                 changes[key] = {"current": current_value, "desired": desired_value}
             continue
 
-        if key in desired_values and desired_values.get(key) is not None:
+        if key in desired_values and (desired_values.get(key) is not None or not ignore_unset):
             current_value = current_service_info.get(key)
             desired_value = desired_values.get(key)
             if current_value != desired_value:
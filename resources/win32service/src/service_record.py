@@ -0,0 +1,120 @@
+import json
+import sys
+
+from projection import SERVICE_PROPERTIES
+from service_helpers import get_service_state_description, get_start_type_description
+
+# Resource property names and the record attributes holding them, in output order
+_ATTRIBUTES = {
+    "name": "name",
+    "path": "path",
+    "startupType": "startup_type",
+    "logon": "logon",
+    "state": "state",
+    "displayName": "display_name",
+    "description": "description",
+    "dependencies": "dependencies",
+}
+
+# `"name": ` etc., encoded once
+_KEY_PREFIXES = {key: json.dumps(key) + ": " for key in _ATTRIBUTES}
+_encode = json.JSONEncoder().encode
+
+
+class ServiceRecord:
+    """
+    Immutable information about a single service.
+
+    Records take a fraction of the memory of the equivalent dict: they have
+    no per-instance dict, start types and states are the shared strings of
+    the module-level mappings in `service_helpers`, and account names are
+    interned since most services run as one of a handful.
+    Properties that were not queried are None and can be left out when
+    serializing with a projection.
+
+    Reading works like a mapping of resource property names
+    (`record["startupType"]`, `record.get("logon")`), so records can be
+    passed where service dicts are compared.
+    """
+
+    __slots__ = tuple(_ATTRIBUTES.values())
+
+    def __init__(self, name, path=None, startup_type=None, logon=None, state=None,
+                 display_name=None, description=None, dependencies=None):
+        set_attribute = object.__setattr__
+        set_attribute(self, "name", name)
+        set_attribute(self, "path", path)
+        set_attribute(self, "startup_type", startup_type)
+        set_attribute(self, "logon", sys.intern(logon) if isinstance(logon, str) else logon)
+        set_attribute(self, "state", state)
+        set_attribute(self, "display_name", display_name)
+        set_attribute(self, "description", description)
+        set_attribute(self, "dependencies", tuple(dependencies) if dependencies is not None else None)
+
+    @classmethod
+    def from_config(cls, name, config=None, description=None, status=None, display_name=None):
+        """
+        Builds a record from the tuples pywin32 returns.
+
+        Args:
+            name (str): Name of the service.
+            config (tuple): QueryServiceConfig result, or None if not queried.
+            description (str): QueryServiceConfig2 description.
+            status (tuple): QueryServiceStatus or enumeration status, or None.
+            display_name (str): Display name; taken from the config when None.
+        """
+        if config is not None:
+            path, startup_type, logon = config[3], get_start_type_description(config[1]), config[7]
+            dependencies = config[6]
+            display_name = display_name if display_name is not None else config[8]
+        else:
+            path = startup_type = logon = dependencies = None
+        return cls(
+            name,
+            path,
+            startup_type,
+            logon,
+            get_service_state_description(status[1]) if status is not None else None,
+            display_name,
+            description,
+            dependencies,
+        )
+
+    def __setattr__(self, attribute, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    __delattr__ = __setattr__
+
+    def __getitem__(self, key):
+        try:
+            value = getattr(self, _ATTRIBUTES[key])
+        except KeyError:
+            raise KeyError(key) from None
+        # Dependencies are kept as a tuple but compared with input lists
+        return list(value) if key == "dependencies" and value is not None else value
+
+    def get(self, key, default=None):
+        return self[key] if key in _ATTRIBUTES else default
+
+    def __eq__(self, other):
+        if not isinstance(other, ServiceRecord):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        return f"ServiceRecord({self.name!r}, state={self.state!r})"
+
+    def to_dict(self, properties=None):
+        """
+        Returns the selected properties as a dict in output order.
+        """
+        return {key: self[key] for key in properties or SERVICE_PROPERTIES}
+
+    def to_json(self, properties=None):
+        """
+        Serializes the selected properties; same output as `json.dumps(self.to_dict(properties))`.
+        """
+        return "{" + ", ".join(
+            _KEY_PREFIXES[key] + _encode(getattr(self, _ATTRIBUTES[key]))
+            for key in properties or SERVICE_PROPERTIES
+        ) + "}"
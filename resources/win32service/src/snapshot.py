@@ -0,0 +1,271 @@
+import datetime
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from sys import exit
+
+from projection import SERVICE_PROPERTIES
+from service_helpers import log_message, record_changes
+
+# Indexed snapshot layout: a fixed header, an open-addressing hash table of
+# (name hash, record offset, record length) buckets and the records as JSON
+# lines. Lookups hash the name, probe the table and decode a single record.
+INDEXED_MAGIC = b"W32SNAP1"
+_HEADER = struct.Struct("<8sdII")  # magic, creation time, services, buckets
+_BUCKET = struct.Struct("<QQI")  # name hash, record offset, record length (0 = empty)
+
+
+def is_indexed_snapshot(path):
+    """
+    Returns True if the file is an indexed snapshot rather than an export document.
+    """
+    try:
+        with open(path, "rb") as fp:
+            return fp.read(len(INDEXED_MAGIC)) == INDEXED_MAGIC
+    except OSError:
+        return False
+
+
+def load_snapshot(path):
+    """
+    Loads a previous `config export` document and indexes it by service name.
+
+    Both export documents and indexed snapshots written by `config export
+    --save-snapshot` are accepted. A missing file is an empty snapshot, so
+    the first delta export reports every service as added. Exits with code 4
+    if the file is neither.
+
+    Returns:
+        dict: Lower-cased service names mapped to the exported services, in
+            the order of the snapshot.
+    """
+    if is_indexed_snapshot(path):
+        try:
+            with IndexedSnapshot(path) as snapshot:
+                services = list(snapshot)
+        except (OSError, ValueError) as e:
+            log_message("ERROR", "snapshotInvalid", "snapshot", path, str(e))
+            exit(4)
+        return {service["name"].lower(): service for service in services}
+
+    try:
+        with open(path, encoding="utf-8") as fp:
+            document = json.load(fp)
+    except FileNotFoundError:
+        log_message("INFO", "snapshotMissing", "snapshot", path)
+        return {}
+    except (OSError, ValueError) as e:
+        log_message("ERROR", "snapshotInvalid", "snapshot", path, str(e))
+        exit(4)
+
+    services = document.get("services") if isinstance(document, dict) else None
+    if not isinstance(services, list) or not all(
+        isinstance(service, dict) and isinstance(service.get("name"), str) for service in services
+    ):
+        log_message("ERROR", "snapshotInvalid", "snapshot", path, "services")
+        exit(4)
+    return {service["name"].lower(): service for service in services}
+
+
+def write_snapshot(path, document):
+    """
+    Replaces a snapshot file atomically with a new export document.
+
+    Args:
+        path (str): Snapshot file.
+        document (str or bytes): Export JSON, or an indexed snapshot.
+    """
+    if isinstance(document, str):
+        document = document.encode("utf-8")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory or None, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(document)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def diff_services(previous, services, properties=None):
+    """
+    Compares the current services with a snapshot.
+
+    Only the properties present in both the snapshot entry and the current
+    service are compared, so a snapshot exported with fewer properties does
+    not report the others as changed.
+
+    Args:
+        previous (dict): Snapshot as returned by `load_snapshot`.
+        services (list): Current services as dicts, in output order.
+        properties (tuple): Exported properties. All properties when None.
+
+    Returns:
+        dict: 'added' services, 'removed' service names and 'changed'
+            services with the 'before' and 'after' value of every changed
+            property.
+    """
+    compared = [key for key in properties or SERVICE_PROPERTIES if key != "name"]
+    added = []
+    changed = []
+    current_names = set()
+    for service in services:
+        name = service["name"].lower()
+        current_names.add(name)
+        before = previous.get(name)
+        if before is None:
+            added.append(service)
+            continue
+        changes = record_changes(
+            before, service, [key for key in compared if key in before], ignore_unset=False
+        )
+        if changes:
+            changed.append(
+                {
+                    "name": service["name"],
+                    "changes": {
+                        key: {"before": change["current"], "after": change["desired"]}
+                        for key, change in changes.items()
+                    },
+                }
+            )
+
+    removed = [
+        {"name": service["name"]} for name, service in previous.items() if name not in current_names
+    ]
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def _name_hash(name):
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(name.lower().encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def build_indexed_snapshot(records, properties=None, created=None):
+    """
+    Serializes services as an indexed snapshot.
+
+    Args:
+        records (list): ServiceRecords to store.
+        properties (tuple): Properties to store. All properties when None.
+        created (float): Time the services were queried, in seconds since the
+            epoch. Now when None.
+
+    Returns:
+        bytes: The snapshot, to be written with `write_snapshot`.
+    """
+    encoded = [(record.name, record.to_json(properties).encode("utf-8")) for record in records]
+    # At most half full, so probing always reaches an empty bucket
+    bucket_count = 1
+    while bucket_count < 2 * len(encoded):
+        bucket_count *= 2
+    mask = bucket_count - 1
+
+    table = bytearray(bucket_count * _BUCKET.size)
+    offset = _HEADER.size + len(table)
+    for name, data in encoded:
+        name_hash = _name_hash(name)
+        bucket = name_hash & mask
+        while _BUCKET.unpack_from(table, bucket * _BUCKET.size)[2]:
+            bucket = (bucket + 1) & mask
+        _BUCKET.pack_into(table, bucket * _BUCKET.size, name_hash, offset, len(data))
+        offset += len(data) + 1
+
+    header = _HEADER.pack(
+        INDEXED_MAGIC, time.time() if created is None else created, len(encoded), bucket_count
+    )
+    return b"".join([header, table, *(data + b"\n" for _, data in encoded)])
+
+
+class IndexedSnapshot:
+    """
+    Read-only, memory-mapped view of an indexed snapshot.
+
+    Opening the file only reads its header; `lookup` decodes the one record
+    it returns, so the cost of a lookup does not depend on the number of
+    services in the snapshot. Iterating decodes every record in file order.
+
+    Args:
+        path (str): Snapshot written from `build_indexed_snapshot`.
+
+    Raises:
+        OSError: The file cannot be read.
+        ValueError: The file is not an indexed snapshot or is truncated.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as fp:
+            self._size = os.fstat(fp.fileno()).st_size
+            if self._size < _HEADER.size:
+                raise ValueError("not an indexed snapshot")
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.created, self.service_count, self._bucket_count = _HEADER.unpack_from(self._map)
+        buckets = self._bucket_count
+        if magic != INDEXED_MAGIC or not buckets or buckets & (buckets - 1):
+            self.close()
+            raise ValueError("not an indexed snapshot")
+        self._records_offset = _HEADER.size + buckets * _BUCKET.size
+        if self._size < self._records_offset:
+            self.close()
+            raise ValueError("truncated indexed snapshot")
+
+    @property
+    def created_time(self):
+        """
+        Returns the time the snapshot was taken as an ISO 8601 UTC string.
+        """
+        return datetime.datetime.fromtimestamp(self.created, datetime.timezone.utc).isoformat()
+
+    def lookup(self, service_name):
+        """
+        Returns the stored properties of a service, or None if it is not in the snapshot.
+        """
+        name = service_name.lower()
+        name_hash = _name_hash(name)
+        mask = self._bucket_count - 1
+        bucket = name_hash & mask
+        # A valid table always has an empty bucket; a corrupt one is probed at most once
+        for _ in range(self._bucket_count):
+            entry_hash, offset, length = _BUCKET.unpack_from(self._map, _HEADER.size + bucket * _BUCKET.size)
+            if not length:
+                return None
+            if entry_hash == name_hash:
+                service = self._decode(offset, length)
+                if service["name"].lower() == name:
+                    return service
+            bucket = (bucket + 1) & mask
+        return None
+
+    def __iter__(self):
+        offset = self._records_offset
+        for _ in range(self.service_count):
+            end = self._map.find(b"\n", offset)
+            if end < 0:
+                raise ValueError("truncated indexed snapshot")
+            yield self._decode(offset, end - offset)
+            offset = end + 1
+
+    def _decode(self, offset, length):
+        if offset < self._records_offset or offset + length > self._size:
+            raise ValueError("truncated indexed snapshot")
+        service = json.loads(self._map[offset:offset + length])
+        if not isinstance(service, dict) or not isinstance(service.get("name"), str):
+            raise ValueError("invalid record in indexed snapshot")
+        return service
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
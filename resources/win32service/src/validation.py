@@ -0,0 +1,110 @@
+import types
+
+# Python types json.loads produces for each JSON schema type
+_JSON_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "boolean": (bool,),
+    "null": (types.NoneType,),
+    "integer": (int,),
+    "number": (int, float),
+}
+
+
+def compile_schema(schema):
+    """
+    Compiles a JSON schema into a validation function.
+
+    The schema is walked once, here; validating a document only runs the
+    closures built from it. The supported keywords are `type`, `enum`,
+    `properties`, `required`, `additionalProperties` and `items`, which is
+    what the resource schema uses. Annotations such as `description` are
+    ignored.
+
+    Args:
+        schema (dict): JSON schema to compile.
+
+    Returns:
+        callable: `validate(value, path="$", key=None, errors=None)` checking
+            a parsed document in one pass and returning the list of errors
+            found in it. Every error is a tuple of a message ID, the JSON path
+            of the offending value and the message arguments, e.g.
+            `("schemaEnum", "$[2].startupType", "Auto", "Automatic, Manual, Disabled")`.
+            `path` and `key` locate the document, e.g. ("$", 2) for the third
+            item of an input array.
+    """
+    check = _compile(schema)
+
+    def validate(value, path="$", key=None, errors=None):
+        errors = [] if errors is None else errors
+        check(value, path, key, errors)
+        return errors
+
+    return validate
+
+
+def _path(parent, key):
+    # Paths are only formatted for values that fail validation
+    if key is None:
+        return parent
+    if isinstance(key, int):
+        return f"{parent}[{key}]"
+    return f"{parent}.{key}"
+
+
+def _compile(schema):
+    accepted = None
+    if "type" in schema:
+        type_names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        accepted = frozenset(python_type for name in type_names for python_type in _JSON_TYPES[name])
+        expected = " or ".join(type_names)
+
+    allowed = tuple(schema["enum"]) if "enum" in schema else None
+    if allowed is not None:
+        allowed_text = ", ".join(str(value) for value in allowed)
+
+    check_object = _compile_object(schema)
+    check_items = _compile(schema["items"]) if isinstance(schema.get("items"), dict) else None
+
+    def check(value, parent, key, errors):
+        value_type = type(value)
+        if accepted is not None and value_type not in accepted:
+            errors.append(("schemaType", _path(parent, key), expected))
+            return
+        if allowed is not None and value not in allowed:
+            errors.append(("schemaEnum", _path(parent, key), value, allowed_text))
+            return
+        if check_object is not None and value_type is dict:
+            check_object(value, _path(parent, key), errors)
+        elif check_items is not None and value_type is list:
+            path = _path(parent, key)
+            for index, item in enumerate(value):
+                check_items(item, path, index, errors)
+
+    return check
+
+
+def _compile_object(schema):
+    properties = {name: _compile(subschema) for name, subschema in schema.get("properties", {}).items()}
+    required = tuple(schema.get("required", ()))
+    additional = schema.get("additionalProperties", True)
+    if isinstance(additional, dict):
+        additional = _compile(additional)
+    if not properties and not required and additional is True:
+        return None
+
+    def check_object(value, path, errors):
+        for name in required:
+            if name not in value:
+                errors.append(("schemaRequired", path, name))
+        for name, item in value.items():
+            check = properties.get(name)
+            if check is not None:
+                check(item, path, name, errors)
+            elif additional is False:
+                errors.append(("schemaAdditionalProperty", path, name))
+            elif additional is not True:
+                additional(item, path, name, errors)
+
+    return check_object
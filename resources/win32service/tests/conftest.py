@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+import handles  # noqa: E402
+import scm_backend  # noqa: E402
+
+
+@pytest.fixture
+def fake_backend():
+    """Installs a fresh fake SCM with a handful of services for the duration of a test."""
+    backend = scm_backend.FakeBackend(service_count=5)
+    previous = scm_backend.set_backend(backend)
+    yield backend
+    handles.close_handles()
+    scm_backend.set_backend(previous)
@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import bench_suite  # noqa: E402
+
+
+def test_suite_writes_comparable_results(tmp_path):
+    output = tmp_path / "results.json"
+
+    code = bench_suite.main(["--repeat", "1", "--only", "get_single", "validate", "--output", str(output)])
+
+    results = json.loads(output.read_text())
+    assert code == 0
+    assert set(results["cases"]) == {"get_single", "validate_json_input_object", "validate_json_input_array_1k"}
+    assert results["cases"]["get_single"]["runs"] == 1
+
+
+def test_compare_flags_regressions():
+    baseline = {"cases": {"export_100": {"median": 1.0}, "get_single": {"median": 1.0}}}
+    results = {"cases": {"export_100": {"median": 1.5}, "get_single": {"median": 1.1}}}
+
+    regressions = bench_suite.compare(results, baseline, 0.2)
+
+    assert [regression["case"] for regression in regressions] == ["export_100"]
+
+
+def test_records_take_less_memory_than_dicts(capsys):
+    import bench_records
+
+    results = bench_records.main(["--services", "200"])
+
+    assert results["recordBytes"] < results["dictBytes"]
+    assert json.loads(capsys.readouterr().out) == results
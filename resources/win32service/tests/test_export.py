@@ -0,0 +1,50 @@
+import io
+import json
+
+import caps
+import scm_backend
+
+
+def test_parallel_export_matches_serial_order():
+    backend = scm_backend.FakeBackend(service_count=40)
+    previous = scm_backend.set_backend(backend)
+    try:
+        serial = caps.export_services()
+        parallel = caps.export_services(jobs=8)
+    finally:
+        scm_backend.set_backend(previous)
+
+    assert parallel == serial
+    names = [service["name"] for service in json.loads(parallel)["services"]]
+    assert names == sorted(backend.services)
+
+
+def test_parallel_export_warns_for_failing_services(fake_backend, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(
+        caps, "log_message", lambda level, message, target, *args: warnings.append(level)
+    )
+    fake_backend.inject_error("QueryServiceConfig2", 5, service_name="FakeService00003")
+
+    result = json.loads(caps.export_services(jobs=4))
+
+    assert "FakeService00003" not in [service["name"] for service in result["services"]]
+    assert warnings.count("WARNING") == 1
+
+
+def test_stream_services_writes_one_object_per_line(fake_backend):
+    output = io.StringIO()
+
+    caps.stream_services(output=output)
+
+    lines = output.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == json.loads(caps.export_services())["services"]
+
+
+def test_iter_services_is_lazy(fake_backend):
+    services = caps.iter_services()
+
+    first = next(services)
+
+    assert first["name"] == "FakeService00000"
+    assert fake_backend.calls["OpenService"] == 1
@@ -0,0 +1,87 @@
+import json
+
+import caps
+import scm_backend
+from args import create_parser
+from export_cache import ExportCache
+
+
+def _export(cache):
+    return json.loads(caps.export_services(cache=cache))["services"]
+
+
+def test_second_export_only_queries_changed_services(fake_backend, tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    first = _export(ExportCache(cache_path).load())
+    assert fake_backend.calls["QueryServiceConfig"] == 5
+
+    fake_backend.update_service("FakeService00002", description="Changed")
+    fake_backend.calls.clear()
+    second = _export(ExportCache(cache_path).load())
+
+    assert fake_backend.calls["QueryServiceConfig"] == 1
+    assert fake_backend.calls["QueryServiceConfig2"] == 1
+    assert second[2]["description"] == "Changed"
+    assert second[:2] + second[3:] == first[:2] + first[3:]
+
+
+def test_cached_export_reports_current_state(fake_backend, tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    _export(ExportCache(cache_path).load())
+
+    # A state change does not touch the configuration, but is still reported
+    fake_backend.services["FakeService00001"].state = caps.scm_backend.SERVICE_RUNNING
+    services = _export(ExportCache(cache_path).load())
+
+    assert services[1]["state"] == "running"
+    assert fake_backend.calls["QueryServiceConfig"] == 5
+
+
+def test_refresh_ignores_the_cache_file(fake_backend, tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    _export(ExportCache(cache_path).load())
+    fake_backend.calls.clear()
+
+    # --refresh builds the cache without loading it
+    _export(ExportCache(cache_path))
+
+    assert fake_backend.calls["QueryServiceConfig"] == 5
+
+
+def test_save_drops_removed_services(fake_backend, tmp_path):
+    cache_path = tmp_path / "cache.json"
+    _export(ExportCache(str(cache_path)).load())
+    del fake_backend.services["FakeService00004"]
+
+    _export(ExportCache(str(cache_path)).load())
+
+    saved = json.loads(cache_path.read_text())
+    assert "FakeService00004" not in saved["services"]
+    assert len(saved["services"]) == 4
+
+
+def test_enumeration_only_export_keeps_the_cache(fake_backend, tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    _export(ExportCache(cache_path).load())
+
+    caps.export_services(cache=ExportCache(cache_path).load(), properties=("name", "state"))
+    cache = ExportCache(cache_path).load()
+    _export(cache)
+
+    assert len(cache.entries) == 5
+    assert cache.hits == 5
+
+
+def test_export_is_uncached_unless_asked():
+    parser = create_parser()
+
+    assert not parser.parse_args(["config", "export"]).cache
+    assert parser.parse_args(["config", "export", "--cache"]).cache
+
+
+def test_fake_change_times_differ_between_backends():
+    # A cache written by one fake run must not look fresh to the next
+    first = scm_backend.FakeBackend(service_count=1)
+    second = scm_backend.FakeBackend(service_count=1)
+
+    assert first.get_service_change_time("FakeService00000") != second.get_service_change_time("FakeService00000")
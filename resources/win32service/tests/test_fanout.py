@@ -0,0 +1,113 @@
+import io
+import json
+import time
+
+import pytest
+
+import caps
+import fanout
+import scm_backend
+from schema import SERVICE_SCHEMA_JSON
+
+
+def test_export_machines_tags_results_by_machine(fake_backend):
+    fake_backend.add_host("web01")
+    fake_backend.add_host("web02", error=scm_backend.ERROR_ACCESS_DENIED)
+
+    result = json.loads(caps.export_machines(["web01", "web02", "missing"], properties=("name",)))
+
+    machines = result["machines"]
+    assert [entry["machine"] for entry in machines] == ["web01", "web02", "missing"]
+    assert len(machines[0]["services"]) == 5
+    assert "Access is denied" in machines[1]["error"]
+    assert "RPC server is unavailable" in machines[2]["error"]
+
+
+def test_slow_machine_times_out_without_blocking_others(fake_backend):
+    fake_backend.add_host("fast")
+    fake_backend.add_host("slow", latency=0.5)
+    finished = []
+
+    started = time.perf_counter()
+    results = fanout.fan_out(
+        ["slow", "fast"],
+        lambda machine: caps.get_handle_manager(machine).scm() and machine,
+        on_result=lambda machine, result, error: finished.append(machine),
+        timeout=0.1,
+    )
+
+    assert time.perf_counter() - started < 0.4
+    assert finished == ["fast", "slow"]
+    assert results[0][2] is not None and results[1] == ("fast", "fast", None)
+
+
+def test_stream_writes_one_tagged_line_per_service(fake_backend):
+    fake_backend.add_host("a")
+    fake_backend.add_host("b")
+    output = io.StringIO()
+
+    caps.export_machines(["a", "b"], properties=("name", "state"), output=output, stream=True)
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert len(lines) == 10
+    assert {line["machine"] for line in lines} == {"a", "b"}
+
+
+def test_get_service_on_machines(fake_backend):
+    fake_backend.add_host("db01")
+
+    result = json.loads(caps.get_service(json.dumps(
+        {"name": "FakeService00000", "machines": ["db01", "db02"], "properties": ["state"]}
+    )))
+
+    assert result[0] == {"machine": "db01", "name": "FakeService00000", "state": "running"}
+    assert "error" in result[1]
+
+
+def test_global_limit_bounds_machines_in_flight():
+    in_flight, peak = [0], [0]
+
+    def work(machine):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        in_flight[0] -= 1
+        return machine
+
+    results = fanout.fan_out([f"m{index}" for index in range(6)], work, max_machines=2)
+
+    assert [result[1] for result in results] == [f"m{index}" for index in range(6)]
+    assert peak[0] <= 2
+
+
+@pytest.mark.parametrize(
+    "operation, inputs",
+    [
+        (caps.set_service, {"name": "FakeService00000", "path": "C:\\x.exe", "machines": ["web01"]}),
+        (caps.delete_service, {"name": "FakeService00000", "machines": ["web01"]}),
+        (caps.get_service, [{"name": "FakeService00000", "machines": ["web01"]}]),
+    ],
+)
+def test_machines_are_rejected_where_not_supported(fake_backend, operation, inputs):
+    fake_backend.add_host("web01")
+
+    with pytest.raises(SystemExit) as e:
+        operation(json.dumps(inputs))
+
+    assert e.value.code == 4
+    assert sum(fake_backend.calls.values()) == 0
+    assert fake_backend.services["FakeService00000"].path == "C:\\Fake\\service00000.exe"
+
+
+def test_machines_are_not_in_the_published_schema():
+    assert "machines" not in json.loads(SERVICE_SCHEMA_JSON)["properties"]
+
+
+def test_machines_are_rejected_with_a_snapshot(fake_backend, tmp_path):
+    path = tmp_path / "services.snap"
+    caps.export_services(snapshot_path=str(path))
+
+    with pytest.raises(SystemExit) as e:
+        caps.get_service(json.dumps({"name": "FakeService00000", "machines": ["web01"]}), snapshot_path=str(path))
+
+    assert e.value.code == 4
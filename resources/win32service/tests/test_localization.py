@@ -0,0 +1,48 @@
+import localization
+
+
+def write_po(path, messages):
+    lines = ['msgid ""', 'msgstr ""', '"Language: test\\n"', ""]
+    for message_id, text in messages.items():
+        lines += [f'msgid "{message_id}"', f'msgstr "{text}"', ""]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def test_language_chain_falls_back_to_parent_and_default():
+    assert localization.get_language_chain("de-at") == ["de-at", "de", "en-us"]
+    assert localization.get_language_chain("fr") == ["fr", "en-us"]
+
+
+def test_parse_po_file_skips_header_and_untranslated_entries(tmp_path):
+    po_file = tmp_path / "xx.po"
+    po_file.write_text(
+        'msgid ""\nmsgstr ""\n"Language: xx\\n"\n\n'
+        'msgid "greeting"\nmsgstr ""\n"Hello \\"{0}\\"\\n"\n\n'
+        'msgid "missing"\nmsgstr ""\n',
+        encoding="utf-8",
+    )
+
+    assert localization.parse_po_file(po_file) == {"greeting": 'Hello "{0}"\n'}
+
+
+def test_templates_follow_the_fallback_chain(tmp_path):
+    write_po(tmp_path / "en-us.po", {"a": "A en", "b": "B en", "c": "C en"})
+    write_po(tmp_path / "de.po", {"a": "A de", "b": "B de"})
+    write_po(tmp_path / "de-at.po", {"a": "A at"})
+    localization.compile_catalogs(str(tmp_path))
+
+    templates = localization.load_templates("de-at", str(tmp_path))
+
+    assert templates == {"a": "A at", "b": "B de", "c": "C en"}
+
+
+def test_catalog_is_loaded_on_first_message(monkeypatch):
+    loads = []
+    monkeypatch.setattr(localization, "load_templates", lambda: loads.append(1) or {"hi": "Hi {0}"})
+    localization.reset_localization()
+
+    assert not loads
+    assert localization._("hi", "there") == "Hi there"
+    assert localization._("unknown") == "unknown"
+    assert len(loads) == 1
+    localization.reset_localization()
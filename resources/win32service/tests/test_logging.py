@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+import service_helpers
+
+
+@pytest.fixture
+def log_level():
+    yield service_helpers.set_log_level
+    service_helpers._min_log_level = None
+
+
+def test_messages_below_the_level_are_not_formatted(log_level, capsys):
+    log_level("info")
+    evaluated = []
+
+    service_helpers.log_message("DEBUG", "serviceGetRetrieving", "service", lambda: evaluated.append(1))
+
+    assert not evaluated
+    assert capsys.readouterr().err == ""
+
+
+def test_emitted_messages_are_formatted_lazily(log_level, capsys):
+    log_level("debug")
+
+    service_helpers.log_message("WARNING", "plain {0} and {1}", "service", "text", lambda: "lazy")
+
+    entry = json.loads(capsys.readouterr().err)
+    assert entry["level"] == "WARN"
+    assert entry["fields"]["message"] == "plain text and lazy"
+
+
+def test_level_is_read_from_dsc_trace_level(monkeypatch):
+    monkeypatch.setenv("DSC_TRACE_LEVEL", "error")
+    service_helpers._min_log_level = None
+
+    assert service_helpers.get_log_level() == service_helpers.LOG_LEVELS["ERROR"]
+    service_helpers._min_log_level = None
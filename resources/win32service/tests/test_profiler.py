@@ -0,0 +1,42 @@
+import json
+
+import caps
+import profiler
+import scm_backend
+
+
+def test_profiler_counts_calls_and_failures(fake_backend, monkeypatch):
+    profiling = profiler.ProfilingBackend(fake_backend)
+    scm_backend.set_backend(profiling)
+    monkeypatch.setattr(profiler, "_profiler", profiling)
+    fake_backend.inject_error("QueryServiceConfig2", 5, service_name="FakeService00001")
+
+    services = json.loads(caps.export_services(jobs=2))["services"]
+
+    summary = profiling.summary()
+    assert len(services) == 4
+    assert summary["calls"]["OpenService"]["count"] == 5
+    assert summary["calls"]["QueryServiceConfig2"]["failures"] == {"5": 1}
+    assert summary["calls"]["EnumServicesStatus"]["maxSeconds"] <= summary["wallSeconds"]
+    assert {service["name"] for service in summary["services"]} == set(fake_backend.services)
+
+
+def test_summary_lists_slowest_services_first():
+    profiling = profiler.ProfilingBackend(scm_backend.FakeBackend())
+    profiling.record_service("Fast", 0.1)
+    profiling.record_service("Slow", 2.0)
+    profiling.record_service("Medium", 1.0)
+
+    summary = profiling.summary(slowest=2)
+
+    assert [service["name"] for service in summary["services"]] == ["Slow", "Medium"]
+
+
+def test_write_profile_writes_json(tmp_path):
+    profiling = profiler.ProfilingBackend(scm_backend.FakeBackend(service_count=1))
+    profiling.open_sc_manager(None, None, scm_backend.SC_MANAGER_CONNECT)
+    output = tmp_path / "profile.json"
+
+    profiler.write_profile(profiling, str(output))
+
+    assert json.loads(output.read_text())["calls"]["OpenSCManager"]["count"] == 1
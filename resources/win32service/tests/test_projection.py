@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+import caps
+from projection import parse_properties
+
+
+def test_status_only_export_uses_the_enumeration(fake_backend):
+    services = json.loads(caps.export_services(properties=parse_properties("name,state")))["services"]
+
+    assert services[0] == {"name": "FakeService00000", "state": "running"}
+    assert len(services) == 5
+    assert fake_backend.calls["OpenService"] == 0
+    assert fake_backend.calls["QueryServiceConfig"] == 0
+
+
+def test_export_projection_skips_description(fake_backend):
+    services = json.loads(caps.export_services(properties=("name", "startupType")))["services"]
+
+    assert list(services[1]) == ["name", "startupType"]
+    assert fake_backend.calls["QueryServiceConfig"] == 5
+    assert fake_backend.calls["QueryServiceConfig2"] == 0
+
+
+def test_get_projection_only_queries_status(fake_backend):
+    result = json.loads(caps.get_service('{"name": "FakeService00001", "properties": ["state"]}'))
+
+    assert result == {"name": "FakeService00001", "state": "stopped"}
+    assert fake_backend.calls["QueryServiceStatus"] == 1
+    assert fake_backend.calls["QueryServiceConfig"] == 0
+    assert fake_backend.calls["QueryServiceConfig2"] == 0
+
+
+def test_get_projection_reports_missing_services(fake_backend):
+    result = json.loads(caps.get_service('{"name": "Missing", "properties": ["name"]}'))
+
+    assert result == {"name": "Missing", "_exist": False}
+
+
+def test_projection_keeps_output_order():
+    assert parse_properties(["description", "state"]) == ("name", "state", "description")
+
+
+def test_unknown_property_exits_with_code_4():
+    with pytest.raises(SystemExit) as e:
+        parse_properties("name,colour")
+
+    assert e.value.code == 4
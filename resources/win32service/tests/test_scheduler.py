@@ -0,0 +1,105 @@
+import json
+import threading
+
+import pytest
+
+import caps
+from scheduler import DependencyCycleError, dependency_waves, run_waves
+
+
+def test_dependency_waves_orders_dependencies_first():
+    waves = dependency_waves({
+        "Web": ["App", "Tcpip"],
+        "App": ["db"],
+        "Db": [],
+        "Cache": None,
+    })
+
+    assert waves == [["Db", "Cache"], ["App"], ["Web"]]
+
+
+def test_dependency_waves_detects_cycles():
+    with pytest.raises(DependencyCycleError) as e:
+        dependency_waves({"A": ["B"], "B": ["C"], "C": ["A"], "D": []})
+
+    assert e.value.services == ["A", "B", "C"]
+
+
+def test_run_waves_runs_a_wave_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+
+    results = run_waves([["a", "b", "c"], ["d"]], lambda item: barrier.wait() if item != "d" else "done", jobs=3)
+
+    assert results["d"] == "done"
+
+
+def test_batch_set_creates_dependencies_first(fake_backend, capsys, monkeypatch):
+    created = []
+    create_service = fake_backend.create_service
+    monkeypatch.setattr(
+        fake_backend,
+        "create_service",
+        lambda scm, name, *args: created.append(name) or create_service(scm, name, *args),
+    )
+
+    with pytest.raises(SystemExit) as e:
+        caps.set_service(
+            json.dumps([
+                {"name": "Front", "path": "C:\\f.exe", "dependencies": ["Middle"]},
+                {"name": "Middle", "path": "C:\\m.exe", "dependencies": ["Back"]},
+                {"name": "Back", "path": "C:\\b.exe"},
+                {"name": "Other", "path": "C:\\o.exe"},
+            ]),
+            jobs=4,
+        )
+
+    assert e.value.code == 0
+    assert created.index("Back") < created.index("Middle") < created.index("Front")
+    results = json.loads(capsys.readouterr().out)["services"]
+    assert [result["name"] for result in results] == ["Front", "Middle", "Back", "Other"]
+
+
+def test_batch_set_rejects_dependency_cycles(fake_backend):
+    with pytest.raises(SystemExit) as e:
+        caps.set_service(json.dumps([
+            {"name": "A", "path": "C:\\a.exe", "dependencies": ["B"]},
+            {"name": "B", "path": "C:\\b.exe", "dependencies": ["A"]},
+        ]))
+
+    assert e.value.code == 4
+    assert fake_backend.calls["CreateService"] == 0
+
+
+@pytest.mark.parametrize(
+    "operation, inputs",
+    [
+        (caps.set_service, [{"name": "Svc", "path": "C:\\a.exe"}, {"name": "svc", "path": "C:\\b.exe"}]),
+        (caps.delete_service, ["FakeService00000", "fakeservice00000"]),
+    ],
+)
+def test_batch_rejects_names_differing_only_in_case(fake_backend, operation, inputs):
+    with pytest.raises(SystemExit) as e:
+        operation(json.dumps(inputs))
+
+    assert e.value.code == 4
+    assert fake_backend.calls["CreateService"] == fake_backend.calls["DeleteService"] == 0
+
+
+def test_batch_delete_deletes_dependents_first(fake_backend, capsys, monkeypatch):
+    fake_backend.update_service("FakeService00001", dependencies=["FakeService00002"])
+    fake_backend.update_service("FakeService00000", dependencies=["FakeService00001"])
+    deleted = []
+    delete_service = fake_backend.delete_service
+    monkeypatch.setattr(
+        fake_backend,
+        "delete_service",
+        lambda handle: deleted.append(handle.service_name) or delete_service(handle),
+    )
+
+    with pytest.raises(SystemExit) as e:
+        caps.delete_service(json.dumps(["FakeService00002", "FakeService00000", "FakeService00001"]), jobs=2)
+
+    assert e.value.code == 0
+    assert deleted == ["FakeService00000", "FakeService00001", "FakeService00002"]
+    results = json.loads(capsys.readouterr().out)["services"]
+    assert {result["result"] for result in results} == {"deleted"}
@@ -0,0 +1,185 @@
+import json
+
+import pytest
+
+import caps
+import handles
+import scm_backend
+
+
+def test_fake_backend_generates_deterministic_services():
+    first = scm_backend.FakeBackend(service_count=3)
+    second = scm_backend.FakeBackend(service_count=3)
+
+    assert list(first.services) == ["FakeService00000", "FakeService00001", "FakeService00002"]
+    assert [s.config() for s in first.services.values()] == [
+        s.config() for s in second.services.values()
+    ]
+
+
+def test_fake_backend_injects_errors_for_a_single_service():
+    backend = scm_backend.FakeBackend(service_count=2)
+    backend.inject_error("OpenService", 5, service_name="FakeService00001", times=1)
+    scm = backend.open_sc_manager(None, None, scm_backend.SC_MANAGER_ALL_ACCESS)
+
+    backend.open_service(scm, "FakeService00000", scm_backend.SERVICE_QUERY_CONFIG)
+    with pytest.raises(scm_backend.error) as excinfo:
+        backend.open_service(scm, "FakeService00001", scm_backend.SERVICE_QUERY_CONFIG)
+    assert excinfo.value.winerror == 5
+
+    # The rule is exhausted after one failure
+    backend.open_service(scm, "FakeService00001", scm_backend.SERVICE_QUERY_CONFIG)
+    assert backend.calls["OpenService"] == 3
+
+
+def test_fake_backend_enforces_access_rights():
+    backend = scm_backend.FakeBackend(service_count=1)
+    scm = backend.open_sc_manager(None, None, scm_backend.SC_MANAGER_ALL_ACCESS)
+    service = backend.open_service(scm, "FakeService00000", scm_backend.SERVICE_QUERY_STATUS)
+
+    with pytest.raises(scm_backend.error) as excinfo:
+        backend.query_service_config(service)
+    assert excinfo.value.winerror == scm_backend.ERROR_ACCESS_DENIED
+
+
+def test_get_service_uses_backend(fake_backend):
+    result = json.loads(caps.get_service(json.dumps({"name": "FakeService00000"})))
+
+    assert result == {
+        "name": "FakeService00000",
+        "path": "C:\\Fake\\service00000.exe",
+        "startupType": "Automatic",
+        "logon": "LocalSystem",
+        "state": "running",
+        "displayName": "Fake Service 0",
+        "description": "Simulated service number 0.",
+        "dependencies": [],
+    }
+
+
+def test_get_service_reports_missing_service(fake_backend):
+    result = json.loads(caps.get_service(json.dumps({"name": "DoesNotExist"})))
+
+    assert result == {"name": "DoesNotExist", "_exist": False}
+
+
+def test_export_services_skips_services_that_fail(fake_backend):
+    fake_backend.inject_error("QueryServiceConfig", 5, service_name="FakeService00002")
+
+    result = json.loads(caps.export_services())
+
+    names = [service["name"] for service in result["services"]]
+    assert names == ["FakeService00000", "FakeService00001", "FakeService00003", "FakeService00004"]
+
+
+def test_set_service_creates_then_updates(fake_backend):
+    desired = {"name": "NewService", "path": "C:\\new.exe", "startupType": "Manual"}
+
+    with pytest.raises(SystemExit) as excinfo:
+        caps.set_service(json.dumps(desired))
+    assert excinfo.value.code == 0
+    assert fake_backend.services["NewService"].start_type == scm_backend.SERVICE_DEMAND_START
+
+    desired["startupType"] = "Automatic"
+    with pytest.raises(SystemExit) as excinfo:
+        caps.set_service(json.dumps(desired))
+    assert excinfo.value.code == 0
+    assert fake_backend.calls["ChangeServiceConfig"] == 1
+    assert fake_backend.services["NewService"].start_type == scm_backend.SERVICE_AUTO_START
+
+
+def test_delete_service_stops_and_deletes(fake_backend):
+    with pytest.raises(SystemExit) as excinfo:
+        caps.delete_service(json.dumps({"name": "FakeService00000"}))
+
+    assert excinfo.value.code == 0
+    assert "FakeService00000" not in fake_backend.services
+    assert fake_backend.calls["ControlService"] == 1
+
+
+def test_delete_service_fails_on_access_denied(fake_backend):
+    fake_backend.inject_error("ControlService", 5, service_name="FakeService00000")
+
+    with pytest.raises(SystemExit) as excinfo:
+        caps.delete_service(json.dumps({"name": "FakeService00000"}))
+
+    assert excinfo.value.code == 3
+    assert "FakeService00000" in fake_backend.services
+
+
+def test_export_services_opens_each_service_once(fake_backend):
+    caps.export_services()
+
+    service_count = len(fake_backend.services)
+    assert fake_backend.calls["EnumServicesStatus"] == 1
+    assert fake_backend.calls["OpenService"] == service_count
+    assert fake_backend.calls["QueryServiceConfig"] == service_count
+    assert fake_backend.calls["QueryServiceConfig2"] == service_count
+    assert fake_backend.calls["QueryServiceStatus"] == 0
+
+
+def test_get_service_opens_a_single_service_handle(fake_backend):
+    caps.get_service(json.dumps({"name": "FakeService00001"}))
+
+    assert fake_backend.calls["OpenService"] == 1
+    assert fake_backend.calls["QueryServiceStatus"] == 1
+
+
+def test_get_service_batch_uses_one_scm_handle(fake_backend):
+    inputs = json.dumps(["FakeService00000", {"name": "Missing"}, {"name": "FakeService00004"}])
+
+    result = json.loads(caps.get_service(inputs))
+
+    assert [item["name"] for item in result] == ["FakeService00000", "Missing", "FakeService00004"]
+    assert result[1] == {"name": "Missing", "_exist": False}
+    assert fake_backend.calls["OpenSCManager"] == 1
+    assert all(handle.kind == "scm" for handle in fake_backend.open_handles)
+
+
+def test_get_service_batch_rejects_invalid_items(fake_backend):
+    with pytest.raises(SystemExit) as excinfo:
+        caps.get_service(json.dumps(["FakeService00000", 42]))
+
+    assert excinfo.value.code == 4
+
+
+def test_handle_manager_reuses_scm_and_closes_everything(fake_backend):
+    caps.get_service(json.dumps({"name": "FakeService00000"}))
+    caps.export_services()
+    manager = handles.get_handle_manager()
+
+    stats = manager.stats()
+    assert stats["service"]["open"] == 0
+    assert stats["scm"]["opened"] == fake_backend.calls["OpenSCManager"] == 2
+
+    manager.close()
+    assert not fake_backend.open_handles
+    assert manager.stats()["scm"]["open"] == 0
+
+
+def test_handle_manager_requests_minimal_access(fake_backend):
+    manager = handles.get_handle_manager()
+
+    caps.get_service(json.dumps({"name": "FakeService00000"}))
+
+    (scm,) = [handle for handle in fake_backend.open_handles if handle.kind == "scm"]
+    assert scm.access == scm_backend.SC_MANAGER_CONNECT
+    assert manager.scm(handles.SCM_ACCESS_CONNECT) is scm
+
+
+def test_delete_service_closes_handle_when_stop_fails(fake_backend):
+    fake_backend.inject_error("ControlService", 5)
+
+    with pytest.raises(SystemExit):
+        caps.delete_service(json.dumps({"name": "FakeService00000"}))
+
+    assert handles.get_handle_manager().stats()["service"]["open"] == 0
+
+
+def test_incomplete_backend_fails_at_construction():
+    class PartialBackend(scm_backend.ScmBackend):
+        def open_sc_manager(self, machine_name, database_name, desired_access):
+            return None
+
+    with pytest.raises(TypeError, match="delete_service"):
+        PartialBackend()
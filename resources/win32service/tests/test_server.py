@@ -0,0 +1,64 @@
+import io
+import json
+
+from server import Server
+
+
+def serve(*requests):
+    output = io.StringIO()
+    lines = "\n".join(json.dumps(request) for request in requests) + "\n"
+    Server(io.StringIO(lines), output).serve_forever()
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_server_answers_get_and_export(fake_backend):
+    responses = serve(
+        {"jsonrpc": "2.0", "id": 1, "method": "get", "params": {"input": {"name": "FakeService00000"}}},
+        {"jsonrpc": "2.0", "id": 2, "method": "export"},
+    )
+
+    assert responses[0]["id"] == 1
+    assert responses[0]["result"]["state"] == "running"
+    assert len(responses[1]["result"]["services"]) == len(fake_backend.services)
+
+
+def test_server_returns_exit_codes_as_errors(fake_backend):
+    fake_backend.inject_error("ChangeServiceConfig", 5)
+
+    (response,) = serve(
+        {"jsonrpc": "2.0", "id": 7, "method": "set", "params": {"input": {"name": "FakeService00001", "path": "C:\\x.exe"}}},
+    )
+
+    assert response["error"]["code"] == 3
+
+
+def test_server_rejects_params_of_the_wrong_type(fake_backend):
+    responses = serve(
+        {"jsonrpc": "2.0", "id": 1, "method": "export", "params": {"jobs": "x"}},
+        {"jsonrpc": "2.0", "id": 2, "method": "delete", "params": {"input": {"name": "FakeService00000"}, "whatIf": "yes"}},
+        {"jsonrpc": "2.0", "id": 3, "method": "export", "params": {"machines": ["web01", 2]}},
+    )
+
+    assert [response["error"]["code"] for response in responses] == [-32602, -32602, -32602]
+    assert responses[0]["error"]["data"] == ["params.jobs: expected integer or null"]
+    assert responses[2]["error"]["data"] == ["params.machines[1]: expected string"]
+    assert "FakeService00000" in fake_backend.services
+    assert fake_backend.calls["EnumServicesStatus"] == 0
+
+
+def test_server_reports_protocol_errors_and_stops_on_shutdown(fake_backend):
+    output = io.StringIO()
+    lines = "not json\n" + "\n".join(
+        json.dumps(request)
+        for request in (
+            {"jsonrpc": "2.0", "id": 1, "method": "unknown"},
+            {"jsonrpc": "2.0", "id": 2, "method": "shutdown"},
+            {"jsonrpc": "2.0", "id": 3, "method": "schema"},
+        )
+    )
+
+    Server(io.StringIO(lines), output).serve_forever()
+
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r.get("error", {}).get("code") for r in responses] == [-32700, -32601, None]
+    assert responses[-1]["id"] == 2
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import caps
+import handles
+import scm_backend
+import service_control
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(service_control.time, "sleep", recorded.append)
+    return recorded
+
+
+def delete(name):
+    with pytest.raises(SystemExit) as e:
+        caps.delete_service(json.dumps({"name": name}))
+    return e.value.code
+
+
+def test_delete_waits_for_a_slow_stop_with_backoff(fake_backend, sleeps):
+    service = fake_backend.services["FakeService00000"]
+    service.stop_polls, service.wait_hint = 3, 2000
+
+    assert delete("FakeService00000") == 0
+
+    # A tenth of the 2 s wait hint, doubled on every poll
+    assert sleeps == [0.2, 0.4, 0.8]
+    assert fake_backend.calls["QueryServiceStatus"] == 3
+    assert "FakeService00000" not in fake_backend.services
+
+
+def test_delete_stops_running_dependents_first(fake_backend, sleeps):
+    fake_backend.update_service("FakeService00003", dependencies=["FakeService00000"])
+    fake_backend.services["FakeService00003"].stop_polls = 2
+
+    assert delete("FakeService00000") == 0
+
+    assert fake_backend.services["FakeService00003"].state == scm_backend.SERVICE_STOPPED
+    assert fake_backend.calls["EnumDependentServices"] == 1
+    assert "FakeService00000" not in fake_backend.services
+
+
+@pytest.mark.parametrize("jobs, workers", [(1, 1), (2, 2), (8, 3)])
+def test_dependents_are_stopped_over_at_most_jobs_workers(fake_backend, monkeypatch, jobs, workers):
+    for name in ("FakeService00002", "FakeService00003", "FakeService00004"):
+        fake_backend.update_service(name, dependencies=["FakeService00000"])
+        fake_backend.services[name].state = scm_backend.SERVICE_RUNNING
+    calls = []
+    real_run_waves = service_control.run_waves
+    monkeypatch.setattr(
+        service_control,
+        "run_waves",
+        lambda waves, function, jobs: calls.append(jobs) or real_run_waves(waves, function, jobs),
+    )
+
+    with pytest.raises(SystemExit) as e:
+        caps.delete_service(json.dumps({"name": "FakeService00000"}), jobs=jobs)
+
+    assert e.value.code == 0
+    assert calls == [workers]
+
+
+def test_stop_times_out(fake_backend, sleeps):
+    fake_backend.services["FakeService00000"].stop_polls = 1000
+    manager = handles.get_handle_manager()
+
+    with manager.service("FakeService00000", handles.SERVICE_ACCESS_STOP) as service:
+        with pytest.raises(scm_backend.error) as e:
+            service_control.stop_service(manager, "FakeService00000", service, timeout=0)
+
+    assert e.value.winerror == scm_backend.ERROR_SERVICE_REQUEST_TIMEOUT
+
+
+def test_stop_of_a_stopped_service_does_not_wait(fake_backend, sleeps):
+    manager = handles.get_handle_manager()
+
+    with manager.service("FakeService00001", handles.SERVICE_ACCESS_STOP) as service:
+        assert service_control.stop_service(manager, "FakeService00001", service) is False
+
+    assert sleeps == []
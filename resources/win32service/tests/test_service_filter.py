@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import caps
+from export_cache import ExportCache
+from service_filter import ServiceFilter, parse_filter
+
+
+def _export_names(**kwargs):
+    return [service["name"] for service in json.loads(caps.export_services(**kwargs))["services"]]
+
+
+def test_state_filter_runs_before_opening_services(fake_backend):
+    # Automatic services of the fake are running: 00000 and 00003
+    service_filter = ServiceFilter({"state": "running"})
+
+    names = _export_names(service_filter=service_filter)
+
+    assert names == ["FakeService00000", "FakeService00003"]
+    assert fake_backend.calls["OpenService"] == 2
+    assert fake_backend.calls["QueryServiceConfig"] == 2
+
+
+def test_startup_type_filter_skips_descriptions(fake_backend):
+    service_filter = ServiceFilter({"startupType": ["manual", "disabled"], "name": "*0000[1-4]"})
+
+    names = _export_names(service_filter=service_filter)
+
+    assert names == ["FakeService00001", "FakeService00002", "FakeService00004"]
+    assert fake_backend.calls["QueryServiceConfig"] == 4
+    assert fake_backend.calls["QueryServiceConfig2"] == 3
+
+
+def test_display_name_regex_filter(fake_backend):
+    fake_backend.services["FakeService00002"].display_name = "Windows Time"
+
+    names = _export_names(jobs=4, service_filter=ServiceFilter({"displayName": {"regex": "^windows"}}))
+
+    assert names == ["FakeService00002"]
+
+
+def test_glob_matches_the_whole_name():
+    service_filter = ServiceFilter({"name": "Win*", "displayName": {"regex": "Service"}})
+
+    assert service_filter.matches_enumeration({"name": "WinService", "displayName": "My Service"})
+    assert not service_filter.matches_enumeration({"name": "MyWinService", "displayName": "My Service"})
+
+
+def test_filtered_export_keeps_cache_entries(fake_backend, tmp_path):
+    cache_path = tmp_path / "cache.json"
+    caps.export_services(cache=ExportCache(str(cache_path)).load())
+
+    caps.export_services(
+        cache=ExportCache(str(cache_path)).load(),
+        service_filter=ServiceFilter({"state": "running", "startupType": "Automatic"}),
+    )
+
+    assert len(json.loads(cache_path.read_text())["services"]) == 5
+
+
+@pytest.mark.parametrize("criteria", ['{"unknown": "x"}', '{"name": 1}', '{"name": {"regex": "("}}'])
+def test_invalid_filter_exits_with_code_4(criteria):
+    with pytest.raises(SystemExit) as e:
+        parse_filter(criteria)
+
+    assert e.value.code == 4
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+import caps
+from service_record import ServiceRecord
+
+CONFIG = (0x10, 2, 1, "C:\\svc.exe", "", 0, ["Tcpip"], "LocalSystem", "My Service")
+STATUS = (0x10, 4, 0, 0, 0, 0, 0)
+
+
+def test_record_is_built_from_pywin32_tuples():
+    record = ServiceRecord.from_config("MySvc", CONFIG, "Does things.", STATUS)
+
+    assert record.to_dict() == {
+        "name": "MySvc",
+        "path": "C:\\svc.exe",
+        "startupType": "Automatic",
+        "logon": "LocalSystem",
+        "state": "running",
+        "displayName": "My Service",
+        "description": "Does things.",
+        "dependencies": ["Tcpip"],
+    }
+    assert record.get("unknown", "default") == "default"
+
+
+def test_record_is_immutable():
+    record = ServiceRecord.from_config("MySvc", CONFIG)
+
+    with pytest.raises(AttributeError):
+        record.path = "C:\\other.exe"
+    with pytest.raises(AttributeError):
+        record.extra = 1
+    assert not hasattr(record, "__dict__")
+
+
+def test_record_shares_repeated_strings():
+    first = ServiceRecord.from_config("A", CONFIG, status=STATUS)
+    second = ServiceRecord.from_config("B", CONFIG[:7] + ("".join(["Local", "System"]), "B"), status=STATUS)
+
+    assert first.logon is second.logon
+    assert first.startup_type is second.startup_type
+    assert first.state is second.state
+
+
+@pytest.mark.parametrize("properties", [None, ("name", "state"), ("dependencies", "description")])
+def test_to_json_matches_json_dumps(properties):
+    record = ServiceRecord.from_config("My\"Svc", CONFIG, "Ünïcode", STATUS)
+
+    assert record.to_json(properties) == json.dumps(record.to_dict(properties))
+
+
+def test_export_is_serialized_from_records(fake_backend):
+    services = json.loads(caps.export_services())["services"]
+
+    assert services[0] == {
+        "name": "FakeService00000",
+        "path": "C:\\Fake\\service00000.exe",
+        "startupType": "Automatic",
+        "logon": "LocalSystem",
+        "state": "running",
+        "displayName": "Fake Service 0",
+        "description": "Simulated service number 0.",
+        "dependencies": [],
+    }
@@ -0,0 +1,134 @@
+import json
+
+import pytest
+
+import caps
+import scm_backend
+
+
+def run_set(inputs, what_if=False):
+    with pytest.raises(SystemExit) as excinfo:
+        caps.set_service(json.dumps(inputs), what_if=what_if)
+    return excinfo.value.code
+
+
+def test_batch_set_reports_per_service_results(fake_backend, capsys):
+    desired = [
+        {"name": "NewService", "path": "C:\\new.exe"},
+        {"name": "FakeService00001", "path": "C:\\changed.exe"},
+        {"name": "BadCredentials", "path": "C:\\bad.exe", "username": "svc"},
+    ]
+
+    code = run_set(desired)
+
+    results = json.loads(capsys.readouterr().out)["services"]
+    assert [result["result"] for result in results] == ["created", "updated", "failed"]
+    assert code == 3
+    assert fake_backend.calls["OpenSCManager"] == 1
+    assert fake_backend.services["FakeService00001"].path == "C:\\changed.exe"
+    assert all(handle.kind == "scm" for handle in fake_backend.open_handles)
+
+
+def test_batch_set_succeeds_when_every_service_applies(fake_backend, capsys):
+    code = run_set([{"name": "One", "path": "C:\\one.exe"}, {"name": "Two", "path": "C:\\two.exe"}])
+
+    assert code == 0
+    assert len(json.loads(capsys.readouterr().out)["services"]) == 2
+
+
+def test_set_service_fails_when_update_is_denied(fake_backend):
+    fake_backend.inject_error("ChangeServiceConfig", 5)
+
+    assert run_set({"name": "FakeService00000", "path": "C:\\x.exe"}) == 3
+
+
+def test_batch_what_if_returns_one_plan(fake_backend, capsys):
+    caps.set_service(
+        json.dumps([
+            {"name": "Missing", "path": "C:\\m.exe"},
+            {"name": "FakeService00000", "path": "C:\\p.exe"},
+            {"name": "fakeservice00001", "path": "C:\\Fake\\service00001.exe"},
+        ]),
+        what_if=True,
+    )
+
+    plan = json.loads(capsys.readouterr().out)
+    assert [entry["action"] for entry in plan["services"]] == ["create", "update", "unchanged"]
+    assert plan["services"][0]["changes"]["path"] == {"current": None, "desired": "C:\\m.exe"}
+    assert plan["services"][1]["changes"] == {
+        "path": {"current": "C:\\Fake\\service00000.exe", "desired": "C:\\p.exe"}
+    }
+    assert plan["summary"] == {"create": 1, "update": 1, "unchanged": 1, "failed": 0}
+    assert fake_backend.calls["EnumServicesStatus"] == 1
+    assert fake_backend.calls["QueryServiceConfig"] == 2
+    assert fake_backend.calls["CreateService"] == 0
+
+
+def test_plan_reports_services_that_cannot_be_queried(fake_backend):
+    fake_backend.inject_error("QueryServiceConfig", 5, service_name="FakeService00002")
+
+    plan = caps.plan_services([{"name": "FakeService00002", "path": "C:\\x.exe"}], jobs=4)
+
+    assert plan["services"][0]["action"] == "failed"
+
+
+def test_plan_finds_driver_services(fake_backend):
+    fake_backend.add_service(
+        scm_backend.FakeService("FakeDriver", "C:\\Windows\\fake.sys", service_type=scm_backend.SERVICE_KERNEL_DRIVER)
+    )
+
+    plan = caps.plan_services([{"name": "FakeDriver", "path": "C:\\Windows\\fake.sys"}])
+
+    assert plan["services"] == [{"name": "FakeDriver", "action": "unchanged"}]
+    assert fake_backend.calls["CreateService"] == 0
+
+
+def test_single_what_if_shows_changed_properties(fake_backend, capsys):
+    caps.set_service(json.dumps({"name": "FakeService00000", "path": "C:\\p.exe"}), what_if=True)
+
+    result = json.loads(capsys.readouterr().out)
+    assert result == {"name": "FakeService00000", "path": "C:\\p.exe"}
+    assert fake_backend.calls["ChangeServiceConfig"] == 0
+
+
+def test_set_skips_the_write_when_nothing_differs(fake_backend, capsys):
+    current = json.loads(caps.get_service('{"name": "FakeService00001"}'))
+    desired = {key: current[key] for key in ("name", "path", "startupType", "displayName")}
+
+    code = run_set([desired])
+
+    assert code == 0
+    assert json.loads(capsys.readouterr().out)["services"][0]["result"] == "unchanged"
+    assert fake_backend.calls["CreateService"] == 0
+    assert fake_backend.calls["ChangeServiceConfig"] == 0
+    assert fake_backend.calls["ChangeServiceConfig2"] == 0
+
+
+def test_set_writes_only_changed_properties(fake_backend, monkeypatch):
+    written = []
+    change_service_config = fake_backend.change_service_config
+    monkeypatch.setattr(
+        fake_backend,
+        "change_service_config",
+        lambda *args: written.append(args) or change_service_config(*args),
+    )
+    service = fake_backend.services["FakeService00001"]
+
+    code = run_set({"name": "FakeService00001", "path": service.path, "startupType": "Disabled"})
+
+    assert code == 0
+    start_type, binary_path, dependencies, display_name = (
+        written[0][2], written[0][4], written[0][7], written[0][10]
+    )
+    assert start_type == caps.scm_backend.SERVICE_DISABLED
+    assert binary_path is None and dependencies is None and display_name is None
+    assert fake_backend.calls["CreateService"] == 0
+
+
+def test_set_applies_description(fake_backend):
+    assert run_set({"name": "FakeService00002", "path": "C:\\x.exe", "description": "Hi"}) == 0
+    assert run_set({"name": "Created", "path": "C:\\c.exe", "description": "New"}) == 0
+
+    assert fake_backend.services["FakeService00002"].description == "Hi"
+    assert fake_backend.services["Created"].description == "New"
+    assert fake_backend.calls["ChangeServiceConfig2"] == 2
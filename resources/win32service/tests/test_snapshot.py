@@ -0,0 +1,159 @@
+import json
+
+import pytest
+
+import caps
+
+
+def export_to(path):
+    path.write_text(caps.export_services(), encoding="utf-8")
+
+
+def test_first_delta_reports_every_service_as_added(fake_backend, tmp_path):
+    snapshot = tmp_path / "snapshot.json"
+
+    delta = json.loads(caps.export_delta(str(snapshot), update_snapshot=True))
+
+    assert [service["name"] for service in delta["added"]] == sorted(fake_backend.services)
+    assert delta["removed"] == [] and delta["changed"] == []
+    assert json.loads(snapshot.read_text())["services"] == delta["added"]
+
+
+def test_delta_reports_added_removed_and_changed_services(fake_backend, tmp_path):
+    snapshot = tmp_path / "snapshot.json"
+    export_to(snapshot)
+    fake_backend.update_service("FakeService00001", path="C:\\new.exe", description=None)
+    del fake_backend.services["FakeService00004"]
+
+    delta = json.loads(caps.export_delta(str(snapshot)))
+
+    assert delta["added"] == []
+    assert delta["removed"] == [{"name": "FakeService00004"}]
+    assert delta["changed"] == [
+        {
+            "name": "FakeService00001",
+            "changes": {
+                "path": {"before": "C:\\Fake\\service00001.exe", "after": "C:\\new.exe"},
+                "description": {"before": "Simulated service number 1.", "after": None},
+            },
+        }
+    ]
+
+
+def test_delta_only_compares_properties_of_the_snapshot(fake_backend, tmp_path):
+    snapshot = tmp_path / "snapshot.json"
+    snapshot.write_text(json.dumps({"services": [{"name": "fakeservice00000", "state": "stopped"}]}))
+
+    delta = json.loads(caps.export_delta(str(snapshot), properties=("name", "path", "state")))
+
+    assert delta["changed"] == [
+        {"name": "FakeService00000", "changes": {"state": {"before": "stopped", "after": "running"}}}
+    ]
+    assert len(delta["added"]) == 4
+
+
+def test_invalid_snapshot_exits_with_code_4(fake_backend, tmp_path):
+    snapshot = tmp_path / "snapshot.json"
+    snapshot.write_text("[1, 2]")
+
+    with pytest.raises(SystemExit) as e:
+        caps.export_delta(str(snapshot))
+
+    assert e.value.code == 4
+
+
+def test_get_from_snapshot_reads_one_record_without_the_scm(fake_backend, tmp_path, monkeypatch):
+    import snapshot
+
+    path = tmp_path / "services.snap"
+    caps.export_services(snapshot_path=str(path))
+    fake_backend.calls.clear()
+    decoded = []
+    real_loads = snapshot.json.loads
+    monkeypatch.setattr(snapshot.json, "loads", lambda data: decoded.append(data) or real_loads(data))
+
+    result = json.loads(caps.get_service(json.dumps({"name": "fakeservice00003"}), snapshot_path=str(path)))
+
+    assert result["path"] == "C:\\Fake\\service00003.exe"
+    assert result["snapshotTime"].endswith("+00:00")
+    # The input and the result are str, records come from the map as bytes
+    assert len([data for data in decoded if isinstance(data, bytes)]) == 1
+    assert sum(fake_backend.calls.values()) == 0
+
+
+def test_snapshot_time_is_not_service_state(fake_backend, tmp_path):
+    from schema import SERVICE_SCHEMA
+
+    path = tmp_path / "services.snap"
+    caps.export_services(snapshot_path=str(path))
+    result = json.loads(caps.get_service(json.dumps({"name": "FakeService00003"}), snapshot_path=str(path)))
+
+    assert "snapshotTime" not in SERVICE_SCHEMA["properties"]
+    with pytest.raises(SystemExit) as e:
+        caps.set_service(json.dumps(result))
+    assert e.value.code == 4
+
+
+def test_get_from_snapshot_projects_and_reports_missing_services(fake_backend, tmp_path):
+    path = tmp_path / "services.snap"
+    caps.export_services(properties=("name", "state"), snapshot_path=str(path))
+    inputs = json.dumps([{"name": "FakeService00000", "properties": ["path", "state"]}, "Missing"])
+
+    results = json.loads(caps.get_service(inputs, snapshot_path=str(path)))
+
+    assert [{key: value for key, value in result.items() if key != "snapshotTime"} for result in results] == [
+        {"name": "FakeService00000", "state": "running"},
+        {"name": "Missing", "_exist": False},
+    ]
+
+
+def test_indexed_snapshot_finds_every_service(tmp_path):
+    import snapshot
+    from service_record import ServiceRecord
+
+    records = [ServiceRecord(f"Service{index}", state="running") for index in range(300)]
+    path = tmp_path / "services.snap"
+    snapshot.write_snapshot(str(path), snapshot.build_indexed_snapshot(records, ("name", "state"), created=0))
+
+    with snapshot.IndexedSnapshot(str(path)) as indexed:
+        assert indexed.service_count == 300
+        assert indexed.created_time == "1970-01-01T00:00:00+00:00"
+        assert all(indexed.lookup(f"SERVICE{index}")["name"] == f"Service{index}" for index in range(300))
+        assert indexed.lookup("Service300") is None
+
+
+def test_get_from_an_invalid_snapshot_exits_with_code_4(fake_backend, tmp_path):
+    path = tmp_path / "services.snap"
+    path.write_text('{"services": []}')
+
+    with pytest.raises(SystemExit) as e:
+        caps.get_service(json.dumps({"name": "FakeService00000"}), snapshot_path=str(path))
+
+    assert e.value.code == 4
+
+
+def test_truncated_snapshot_exits_with_code_4(fake_backend, tmp_path):
+    path = tmp_path / "services.snap"
+    caps.export_services(snapshot_path=str(path))
+    data = path.read_bytes()
+
+    for size in (40, len(data) - 20):
+        path.write_bytes(data[:size])
+        with pytest.raises(SystemExit) as e:
+            caps.get_service(json.dumps(["FakeService00000", "FakeService00004"]), snapshot_path=str(path))
+        assert e.value.code == 4
+
+
+def test_delta_against_an_indexed_snapshot_keeps_its_format(fake_backend, tmp_path):
+    import snapshot
+
+    path = tmp_path / "services.snap"
+    caps.export_services(snapshot_path=str(path))
+    fake_backend.update_service("FakeService00002", path="C:\\new.exe")
+
+    delta = json.loads(caps.export_delta(str(path), update_snapshot=True))
+
+    assert [service["name"] for service in delta["changed"]] == ["FakeService00002"]
+    assert delta["added"] == [] and delta["removed"] == []
+    with snapshot.IndexedSnapshot(str(path)) as indexed:
+        assert indexed.lookup("FakeService00002")["path"] == "C:\\new.exe"
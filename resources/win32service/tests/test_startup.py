@@ -0,0 +1,120 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+# Runs the CLI against the fake backend
+FAKE_MAIN = os.path.join(ROOT_DIR, "benchmarks", "fake_main.py")
+
+GET_ARGS = ("config", "get", "--input", '{"name": "Missing"}')
+SET_ARGS = ("config", "set", "--what-if", "--input", '{"name": "Missing", "path": "C:\\\\missing.exe"}')
+DELETE_ARGS = ("config", "delete", "--what-if", "--input", '{"name": "Missing"}')
+
+# Number of modules each command may import on top of a bare interpreter. Unlike
+# import times, these counts do not depend on machine load, so they are always
+# checked; the margin absorbs differences between Python versions.
+IMPORT_BUDGETS = {
+    ("schema",): 60,
+    GET_ARGS: 80,
+    ("config", "export"): 80,
+    SET_ARGS: 80,
+    DELETE_ARGS: 80,
+    ("serve",): 80,
+}
+
+# Wall-clock budgets depend on machine load and bytecode caching, so they are
+# only checked when opted in, e.g. on a dedicated benchmark runner.
+CHECK_IMPORT_TIMES = os.environ.get("WIN32SERVICE_CHECK_IMPORT_BUDGETS") == "1"
+
+# Cumulative import time budget per command in milliseconds. Only modules that a
+# bare interpreter does not import already are counted.
+IMPORT_BUDGETS_MS = {
+    ("schema",): 50,
+    GET_ARGS: 100,
+    ("config", "export"): 100,
+    SET_ARGS: 100,
+    DELETE_ARGS: 100,
+    ("serve",): 100,
+}
+
+# Modules the schema command must not pull in
+SCHEMA_FORBIDDEN_MODULES = {"caps", "scm_backend", "service_helpers", "server", "win32service"}
+
+# Modules only needed by some options, which plain config commands must not pull in
+CONFIG_FORBIDDEN_MODULES = {"asyncio", "fanout", "snapshot", "export_cache", "service_filter", "server"}
+
+
+def import_times(*args, top_level_only=True):
+    """
+    Runs the CLI with -X importtime and returns the cumulative microseconds of
+    every import that a bare interpreter does not perform.
+    """
+    baseline = {
+        name
+        for _, name, _ in _parse_importtime(
+            subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", "pass"],
+                capture_output=True,
+                text=True,
+            ).stderr
+        )
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", FAKE_MAIN, *args],
+        input="",
+        capture_output=True,
+        text=True,
+        cwd=SRC_DIR,
+    )
+    measured = _parse_importtime(result.stderr)
+    top_level = min((indent for indent, _, _ in measured), default=0)
+    return {
+        name: cumulative
+        for indent, name, cumulative in measured
+        if name not in baseline
+        and (indent == top_level or not top_level_only)
+    }
+
+
+def _parse_importtime(stderr):
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        indent = len(name) - len(name.lstrip())
+        entries.append((indent, name.strip(), int(cumulative)))
+    return entries
+
+
+@pytest.mark.parametrize("args", list(IMPORT_BUDGETS), ids=" ".join)
+def test_cold_start_module_budget(args):
+    imported = import_times(*args, top_level_only=False)
+
+    assert imported
+    assert len(imported) <= IMPORT_BUDGETS[args], sorted(imported)
+
+
+@pytest.mark.skipif(not CHECK_IMPORT_TIMES, reason="set WIN32SERVICE_CHECK_IMPORT_BUDGETS=1")
+@pytest.mark.parametrize("args", list(IMPORT_BUDGETS_MS), ids=" ".join)
+def test_cold_start_import_budget(args):
+    # Take the best of a few runs to keep the check stable on busy machines
+    totals = [sum(import_times(*args).values()) for _ in range(3)]
+
+    assert min(totals) / 1000 <= IMPORT_BUDGETS_MS[args]
+
+
+def test_schema_command_imports_no_service_modules():
+    imported = set(import_times("schema", top_level_only=False))
+
+    assert not imported & SCHEMA_FORBIDDEN_MODULES
+
+
+def test_config_get_imports_no_optional_modules():
+    imported = set(import_times(*GET_ARGS, top_level_only=False))
+
+    assert "caps" in imported
+    assert not imported & CONFIG_FORBIDDEN_MODULES
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import caps
+import service_helpers
+from schema import GET_INPUT_SCHEMA, SERVICE_SCHEMA
+from validation import compile_schema
+
+validate = compile_schema(GET_INPUT_SCHEMA)
+
+
+def logged_errors(monkeypatch):
+    errors = []
+    monkeypatch.setattr(
+        service_helpers,
+        "log_message",
+        lambda level, message, target, *args: errors.append((message, *args)) if level == "ERROR" else None,
+    )
+    return errors
+
+
+def test_valid_service_has_no_errors():
+    assert validate({"name": "svc", "startupType": "Manual", "dependencies": None, "properties": ["state"]}) == []
+
+
+def test_all_errors_are_collected_in_one_pass():
+    errors = validate(
+        {"path": 42, "startupType": "Auto", "colour": "red", "properties": ["name", "size"]}
+    )
+
+    assert sorted(errors) == sorted([
+        ("schemaRequired", "$", "name"),
+        ("schemaType", "$.path", "string"),
+        ("schemaEnum", "$.startupType", "Auto", "Automatic, Manual, Disabled"),
+        ("schemaAdditionalProperty", "$", "colour"),
+        ("schemaEnum", "$.properties[1]", "size",
+         "name, path, startupType, logon, state, displayName, description, dependencies"),
+    ])
+
+
+def test_union_types_and_nested_schemas():
+    validate_items = compile_schema({"type": "array", "items": {"type": ["integer", "null"]}})
+
+    assert validate_items([1, None]) == []
+    assert validate_items([1, "two", True]) == [
+        ("schemaType", "$[1]", "integer or null"),
+        ("schemaType", "$[2]", "integer or null"),
+    ]
+
+
+def test_query_options_are_not_service_state(fake_backend):
+    assert "properties" not in SERVICE_SCHEMA["properties"]
+    assert compile_schema(SERVICE_SCHEMA)({"name": "svc", "properties": ["state"]}) == [
+        ("schemaAdditionalProperty", "$", "properties")
+    ]
+
+    with pytest.raises(SystemExit) as e:
+        caps.set_service(json.dumps({"name": "FakeService00001", "path": "C:\\x.exe", "properties": ["state"]}))
+
+    assert e.value.code == 4
+    assert fake_backend.calls["OpenSCManager"] == 0
+
+
+def test_array_input_reports_errors_of_every_item(monkeypatch):
+    errors = logged_errors(monkeypatch)
+    inputs = json.dumps(["svc", {"name": "a", "startupType": "Boot"}, 42, {"path": "x"}])
+
+    with pytest.raises(SystemExit) as e:
+        service_helpers.validate_json_input(inputs, allow_array=True, schema=SERVICE_SCHEMA)
+
+    assert e.value.code == 4
+    assert errors == [
+        ("schemaEnum", "$[1].startupType", "Boot", "Automatic, Manual, Disabled"),
+        ("schemaType", "$[2]", "object"),
+        ("schemaRequired", "$[3]", "name"),
+    ]
+
+
+def test_missing_required_properties_exit_with_code_1(monkeypatch):
+    errors = logged_errors(monkeypatch)
+
+    with pytest.raises(SystemExit) as e:
+        service_helpers.validate_json_input('{"name": "svc"}', "path", schema=SERVICE_SCHEMA)
+
+    assert e.value.code == 1
+    assert errors == [("schemaRequired", "$", "path")]
+
+
+def test_set_rejects_an_unknown_startup_type(fake_backend):
+    with pytest.raises(SystemExit) as e:
+        caps.set_service(json.dumps({"name": "FakeService00001", "path": "C:\\x.exe", "startupType": "Auto"}))
+
+    assert e.value.code == 4
+    assert fake_backend.calls["OpenSCManager"] == 0
+    assert fake_backend.services["FakeService00001"].path == "C:\\Fake\\service00001.exe"
@@ -76,7 +76,7 @@ Describe "Win32Service config whatIf tests" {
         $out.results.result.changedProperties | Should -Contain 'description'
     }
 
-    It 'Throws an error in whatIf mode that is unelevated' -Skip:($result) {
+    It 'Reports a missing service as to be created in whatIf mode when unelevated' -Skip:($result) {
         $config = @{
             '$schema' = 'https://aka.ms/dsc/schemas/v3/bundled/config/document.json'
             resources = @(
@@ -92,9 +92,12 @@ Describe "Win32Service config whatIf tests" {
             )
         }
 
+        # Querying a service only needs connect access, which does not require elevation
         $out = dsc config set --input ($config | ConvertTo-Json -Depth 10) -w 2>&1
-        $out[0] | Should -BeLike '*ERROR*'
-        $out[0] | Should -BeLike '*Access is denied*'
+        $LASTEXITCODE | Should -Be 0
+        ($out | Out-String) | Should -Not -BeLike '*Access is denied*'
+        $json = $out | Where-Object { $_ -is [string] } | ConvertFrom-Json
+        $json.results.result.afterState.name | Should -Be 'NewService'
     }
 }
 
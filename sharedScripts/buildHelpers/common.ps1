@@ -211,10 +211,10 @@ function Build-PythonProject {
             # Sync all the dependencies
             & uv sync
 
-            $poFiles = Get-ChildItem -Path $ProjectPath -Filter '*.po' -Recurse
-            foreach ($poFile in $poFiles) {
-                $moFile = [System.IO.Path]::ChangeExtension($poFile.FullName, '.mo')
-                & msgfmt.exe -o $moFile $poFile.FullName --verbose
+            # Precompile the .po message catalogs into JSON lookup tables, for
+            # projects that ship them
+            if (Test-Path -Path (Join-Path $sourceDir 'localization.py')) {
+                & python localization.py
             }
 
             # Add locales directory to the path